@@ -0,0 +1,108 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = {}    # user_id -> time of activity not yet written
+_recorded = {}   # user_id -> monotonic time it was last buffered
+_last_flush = time.monotonic()
+_timer = None    # flushes the buffer when no request comes to do it
+
+
+def _throttle():
+    return getattr(settings, 'ACTIVITY_THROTTLE', timedelta(minutes=5)).total_seconds()
+
+
+def touch(user_id):
+    """
+    Record that `user_id` is active, at most once per ACTIVITY_THROTTLE.
+
+    Activity is buffered in this process and written by `flush`, which runs
+    from here once ACTIVITY_BATCH_SIZE users are waiting, from a timer at
+    most ACTIVITY_FLUSH_INTERVAL after the buffer fills, and at exit. A crash
+    loses at most one interval of activity.
+    """
+    global _timer
+    tick = time.monotonic()
+    with _lock:
+        last = _recorded.get(user_id)
+        if last is not None and tick - last < _throttle():
+            return
+        _recorded[user_id] = tick
+        _pending[user_id] = timezone.now()
+        interval = getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', timedelta(seconds=30)).total_seconds()
+        due = len(_pending) >= getattr(settings, 'ACTIVITY_BATCH_SIZE', 500) or tick - _last_flush >= interval
+        if not due and _timer is None:
+            _timer = threading.Timer(interval - (tick - _last_flush), _flush_quietly)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush()
+
+
+def flush():
+    """Write buffered activity with one UPDATE ... CASE per batch; returns the user count."""
+    global _last_flush
+    tick = time.monotonic()
+    with _lock:
+        _cancel_timer()
+        pending = list(_pending.items())
+        _pending.clear()
+        _last_flush = tick
+        throttle = _throttle()
+        for user_id in [user_id for user_id, last in _recorded.items() if tick - last >= throttle]:
+            del _recorded[user_id]
+
+    batch_size = getattr(settings, 'ACTIVITY_BATCH_SIZE', 500)
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        Profile.objects.filter(user_id__in=[user_id for user_id, seen in batch]).update(
+            last_active=Case(
+                *[When(user_id=user_id, then=Value(seen)) for user_id, seen in batch],
+                output_field=DateTimeField(),
+            ),
+            cache_version=F('cache_version') + 1,
+        )
+    return len(pending)
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush buffered activity')
+    finally:
+        # Only this thread's connections
+        connections.close_all()
+
+
+def _cancel_timer():
+    global _timer
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+
+
+atexit.register(_flush_quietly)
+
+
+def reset():
+    """Forget buffered activity without writing it."""
+    global _last_flush
+    with _lock:
+        _cancel_timer()
+        _pending.clear()
+        _recorded.clear()
+        _last_flush = time.monotonic()
+_timer = None    # flushes the buffer when no request comes to do it
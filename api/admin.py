@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Profile, Match, Like
+from .models import Profile, Match, Like, Pass
 
 admin.site.register(Profile)
 admin.site.register(Match)
 admin.site.register(Like)
+admin.site.register(Pass)
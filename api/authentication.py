@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Profile
+
+TOKEN_VERSION_CLAIM = 'tv'
+
+
+def context_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_context(user_id):
+    """What authentication needs to know about a user: one cache hit, or one query on a miss."""
+    context = cache.get(context_key(user_id))
+    if context is None:
+        context = (
+            User.objects.filter(pk=user_id)
+            .values('id', 'username', 'is_active', 'is_staff', 'is_superuser',
+                    'profile__token_version', 'profile__is_premium')
+            .first()
+        )
+        if context is None:
+            return None
+        context['token_version'] = context.pop('profile__token_version') or 0
+        context['is_premium'] = bool(context.pop('profile__is_premium'))
+        cache.set(context_key(user_id), context, getattr(settings, 'AUTH_CONTEXT_TIMEOUT', 60))
+    return context
+
+
+def invalidate(user_id):
+    cache.delete(context_key(user_id))
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to the user so far; the version is kept on their profile."""
+    if not Profile.objects.filter(user_id=user_id).update(token_version=F('token_version') + 1):
+        raise Profile.DoesNotExist(f'User {user_id} has no profile, so their tokens cannot be revoked')
+    invalidate(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's signed claims and builds the
+    user from a short-lived cached context instead of loading the User row.
+
+    The returned User carries only id, username and the permission flags,
+    and must not be saved. Tokens whose version claim is older than the
+    profile's token_version are rejected, and deactivating a user takes
+    effect immediately because saving a User drops its cached context.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        context = user_context(user_id)
+        if context is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not context['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != context['token_version']:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+        user = User(
+            id=context['id'],
+            username=context['username'],
+            is_active=context['is_active'],
+            is_staff=context['is_staff'],
+            is_superuser=context['is_superuser'],
+        )
+        user._state.adding = False
+        user._state.db = DEFAULT_DB_ALIAS
+        user.from_token_claims = True
+        return user
@@ -0,0 +1,145 @@
+"""Helpers shared by the benchmark management commands."""
+import http.client
+import itertools
+import json
+import math
+import os
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .serializers import CustomTokenObtainPairSerializer
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of `samples`."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles, in milliseconds, of one run."""
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+    }
+
+
+def access_token(user):
+    """An access token with the same claims as one issued by the token endpoint."""
+    return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def server(command, port, env=None, timeout=30):
+    """Run `command` until the block exits, once it accepts connections on `port`."""
+    process = subprocess.Popen(
+        command,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{command[0]} exited with status {process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'Nothing listening on port {port} after {timeout}s')
+                time.sleep(0.1)
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout)
+
+
+def http_load(port, method, path, headers, requests, concurrency):
+    """
+    Send `requests` requests from `concurrency` keep-alive connections.
+
+    Returns the latency of every successful request, the elapsed time and
+    the number of failed requests (connection errors and 5xx responses).
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while next(counter) < requests:
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                (errors if failed else latencies).append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, len(errors)
+
+
+def measure(client, method, path, **kwargs):
+    """Send one in-process request; returns (seconds, SQL queries, status code)."""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = getattr(client, method.lower())(path, **kwargs)
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries), response.status_code
+
+
+def load_budgets(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_budgets(path, budgets):
+    with open(path, 'w') as file:
+        json.dump(budgets, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def over_budget(results, budgets):
+    """`(endpoint, measurement, value, budget)` for every measurement above its budget."""
+    regressions = []
+    for endpoint, summary in results.items():
+        for measurement, budget in budgets.get(endpoint, {}).items():
+            value = summary.get(measurement)
+            if value is not None and value > budget:
+                regressions.append((endpoint, measurement, value, budget))
+    return regressions
@@ -0,0 +1,57 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 60 * 60)
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_key(profile_id, cache_version):
+    return f'profile:{profile_id}:{cache_version}'
+
+
+def profile_key(profile):
+    # The version is read from the row itself, so building keys costs nothing
+    return cache_key(profile.pk, profile.cache_version)
+
+
+def profile_representations(profiles, serialize, key=profile_key):
+    """
+    Serialized representations of `profiles`, in order.
+
+    One cache round trip fetches every profile; only the misses are
+    serialized with `serialize` and written back in a single set_many.
+    `key` builds a profile's cache key, for profiles that are not instances.
+    """
+    keys = [key(profile) for profile in profiles]
+    cached = cache.get_many(keys) if keys else {}
+
+    missing = {}
+    results = []
+    for key, profile in zip(keys, profiles):
+        data = cached.get(key)
+        if data is None:
+            data = missing[key] = serialize(profile)
+        results.append(data)
+    if missing:
+        cache.set_many(missing, PROFILE_CACHE_TIMEOUT)
+
+    with _lock:
+        _stats['hits'] += len(keys) - len(missing)
+        _stats['misses'] += len(missing)
+    return results
+
+
+def profile_cache_stats():
+    """Hit and miss counters of this process since it started."""
+    with _lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
@@ -0,0 +1,98 @@
+"""
+Per-profile engagement counters.
+
+Likes, matches and blocks adjust the counters with F() updates in the same
+transaction as the row they count, so reads never COUNT(*) the source
+tables. `rebuild` recomputes them from those tables when they drift, e.g.
+after rows were written in bulk or deleted with QuerySet.update().
+"""
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db.models import Case, Count, F, PositiveIntegerField, When
+from django.db.models.functions import Greatest
+
+from .models import Like, Match, Profile, UserBlock, UserMatch
+
+
+def adjust(changes):
+    """
+    Apply `changes`, an iterable of (user_id, counter, delta), to the users'
+    profiles in one UPDATE.
+    """
+    totals = Counter()
+    for user_id, counter, delta in changes:
+        totals[user_id, counter] += delta
+
+    # counter -> delta -> users it applies to, so bulk changes stay one WHEN each
+    users = defaultdict(lambda: defaultdict(list))
+    for (user_id, counter), delta in totals.items():
+        if delta:
+            users[counter][delta].append(user_id)
+    if not users:
+        return
+
+    updates = {
+        counter: Case(
+            *[
+                # Clamped at zero, so a counter that drifted low cannot break its check constraint
+                When(user_id__in=user_ids, then=Greatest(F(counter) + delta, 0, output_field=PositiveIntegerField()))
+                for delta, user_ids in by_delta.items()
+            ],
+            default=F(counter),
+        )
+        for counter, by_delta in users.items()
+    }
+    user_ids = {user_id for by_delta in users.values() for ids in by_delta.values() for user_id in ids}
+    # Cached representations leave the counters out (see rendering.complete), so they stay valid
+    Profile.objects.filter(user_id__in=user_ids).update(**updates)
+
+
+def liked(from_user_id, to_user_ids, delta=1):
+    """The counter changes of `from_user_id` liking (or, with delta=-1, unliking) `to_user_ids`."""
+    return [(from_user_id, 'likes_given', delta * len(to_user_ids))] + [
+        (user_id, 'likes_received', delta) for user_id in to_user_ids
+    ]
+
+
+def matched(matches, delta=1):
+    return [(user_id, 'matches_count', delta) for match in matches for user_id in (match.user1_id, match.user2_id)]
+
+
+def user_deleted(user_id):
+    """The counter changes of deleting `user_id`, and with them their likes, matches and blocks."""
+    def others(queryset, field):
+        return list(queryset.values_list(field, flat=True))
+
+    return (
+        [(user_id, 'likes_received', -1) for user_id in others(Like.objects.filter(from_user_id=user_id), 'to_user_id')]
+        + [(user_id, 'likes_given', -1) for user_id in others(Like.objects.filter(to_user_id=user_id), 'from_user_id')]
+        + [(user_id, 'matches_count', -1) for user_id in others(UserMatch.objects.filter(user_id=user_id), 'other_user_id')]
+        + [(user_id, 'blocks_received', -1) for user_id in others(UserBlock.objects.filter(blocker_id=user_id), 'blocked_id')]
+    )
+
+
+def deleting_user(origin):
+    """Whether a deletion started from deleting users, whose counter changes `user_deleted` makes at once."""
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+
+def counts(queryset, field):
+    return Counter(dict(queryset.values_list(field).annotate(count=Count('pk')).order_by()))
+
+
+def rebuild(batch_size=1000):
+    """Recompute every profile's counters from the source tables; returns the number of profiles fixed."""
+    actual = {
+        'likes_received': counts(Like.objects.all(), 'to_user_id'),
+        'likes_given': counts(Like.objects.all(), 'from_user_id'),
+        'matches_count': counts(Match.objects.all(), 'user1_id') + counts(Match.objects.all(), 'user2_id'),
+        'blocks_received': counts(UserBlock.objects.all(), 'blocked_id'),
+    }
+    stale = []
+    for row in Profile.objects.values('id', 'user_id', *Profile.COUNTER_FIELDS).iterator(chunk_size=batch_size):
+        values = {counter: actual[counter].get(row['user_id'], 0) for counter in Profile.COUNTER_FIELDS}
+        if any(row[counter] != value for counter, value in values.items()):
+            stale.append(Profile(id=row['id'], **values))
+    Profile.objects.bulk_update(stale, Profile.COUNTER_FIELDS, batch_size=batch_size)
+    return len(stale)
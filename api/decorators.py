@@ -0,0 +1,51 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from .rendering import FastJSONRenderer
+
+
+def render(data, status=200, headers=None):
+    """A JSON response rendered the way DRF's JSONRenderer renders API responses."""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+
+
+def async_api_view(methods):
+    """
+    The async counterpart of `@api_view` plus `IsAuthenticated` for JWT endpoints.
+
+    DRF views are sync only, so this authenticates the bearer token, rejects
+    other methods and turns API exceptions into JSON error responses itself.
+    The view gets a DRF Request and must return an HttpResponse.
+    """
+    def decorator(view):
+        # Only bearer tokens are accepted, so there is no session to protect from CSRF
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                detail = f'Method "{request.method}" not allowed.'
+                return render({'detail': detail}, 405, {'Allow': ', '.join(methods)})
+
+            authenticator = CachedJWTAuthentication()
+            request = Request(request)
+            try:
+                # A cold user context costs a query
+                authenticated = await sync_to_async(authenticator.authenticate)(request)
+                if authenticated is None:
+                    raise exceptions.NotAuthenticated()
+                request.user = authenticated[0]
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = {}
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers['WWW-Authenticate'] = authenticator.authenticate_header(request)
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return render(data, exc.status_code, headers)
+        return wrapper
+    return decorator
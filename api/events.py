@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import authentication
+
+logger = logging.getLogger(__name__)
+
+# Event types
+LIKE = 'like'
+MATCH = 'match'
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """Events for one subscriber, queued on the event loop that subscribed."""
+
+    def __init__(self, broker, user_id, queue_size):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, event):
+        # A subscriber that falls this far behind misses the newest events
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Delivers events to subscribers in this process.
+
+    A broker has `publish(user_id, event)`, callable from any thread, and
+    `subscribe(user_id)`, called from an event loop and returning an object
+    with an async `get()` and a `close()`. With several worker processes a
+    user only hears events published by the process they are connected to,
+    so multi-process deployments need an EVENTS_BROKER shared between them;
+    `get_broker` warns when it is used with WEB_CONCURRENCY above 1.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+            event = {**event, 'id': next(self._ids)}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The loop is closed; the subscription is closed on its way out
+                pass
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+
+def get_broker():
+    """The broker named by EVENTS_BROKER, created on first use."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'EVENTS_BROKER', 'api.events.LocalBroker'))()
+            workers = getattr(settings, 'WEB_CONCURRENCY', 1)
+            if isinstance(_broker, LocalBroker) and workers > 1:
+                logger.warning(
+                    'EVENTS_BROKER is the process-local %s with %d workers: clients only receive '
+                    'events published by the worker they are connected to. Set EVENTS_BROKER to a '
+                    'broker shared between the workers, or run a single worker.',
+                    type(_broker).__name__, workers,
+                )
+    return _broker
+
+
+def publish(user_id, event):
+    get_broker().publish(user_id, event)
+
+
+def like_created(from_user_id, to_user_id):
+    """Tell `to_user_id` about a new like once the transaction commits."""
+    transaction.on_commit(lambda: publish(to_user_id, {'type': LIKE, 'user': from_user_id}))
+
+
+def match_created(match):
+    """Tell both users about a new match once the transaction commits."""
+    def send():
+        for user_id, other_user_id in ((match.user1_id, match.user2_id), (match.user2_id, match.user1_id)):
+            publish(user_id, {
+                'type': MATCH,
+                'match': match.id,
+                'user': other_user_id,
+                'created_at': match.created_at.isoformat(),
+            })
+    transaction.on_commit(send)
+
+
+def visible(event, is_premium):
+    """`event` as its recipient may see it: like events only name the liker to premium users."""
+    if event['type'] == LIKE and not is_premium:
+        return {key: value for key, value in event.items() if key != 'user'}
+    return event
+
+
+def format_event(event):
+    """Server-Sent Events framing of `event`."""
+    data = json.dumps({key: value for key, value in event.items() if key != 'id'}, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+async def stream(user_id):
+    """
+    The SSE body of a user's event stream: events as they are published, and
+    a comment line every EVENTS_KEEPALIVE seconds so proxies keep it open.
+
+    Who liked someone is a premium feature (see views.get_received_likes), so
+    the recipient's premium status is checked, from the cached auth context,
+    as each like is delivered.
+    """
+    keepalive = getattr(settings, 'EVENTS_KEEPALIVE', 15)
+    subscription = get_broker().subscribe(user_id)
+    try:
+        yield f"retry: {getattr(settings, 'EVENTS_RETRY_MS', 3000)}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == LIKE:
+                context = await sync_to_async(authentication.user_context)(user_id)
+                event = visible(event, bool(context and context['is_premium']))
+            yield format_event(event)
+    finally:
+        subscription.close()
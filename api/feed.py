@@ -0,0 +1,175 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import geo, hidden, scoring, seen
+from .models import Feed, FeedEntry, Like, Pass, Profile, Report, UserBlock
+
+# Number of candidates stored per feed and how long a built feed stays fresh
+FEED_SIZE = getattr(settings, 'FEED_SIZE', 500)
+FEED_TTL = getattr(settings, 'FEED_TTL', timedelta(hours=24))
+# Compatible profiles read per batch, most recently active first, and the
+# batches a build may read when the first leaves too few unseen profiles
+FEED_CANDIDATES = getattr(settings, 'FEED_CANDIDATES', 10000)
+FEED_BATCHES = getattr(settings, 'FEED_BATCHES', 3)
+# A feed swiped down to fewer entries than this is rebuilt before its TTL
+FEED_LOW_WATER = getattr(settings, 'FEED_LOW_WATER', 20)
+# Most feeds a changed profile is placed in right away, most recently active viewers first
+FEED_REFRESH_LIMIT = getattr(settings, 'FEED_REFRESH_LIMIT', 1000)
+
+
+def age_on(birth_date, today):
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def years_before(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 February in a non-leap target year
+        return today.replace(year=today.year - years, day=28)
+
+
+def compatible_profiles(profile, today=None):
+    """Profiles matching `profile`'s gender, age and distance preferences, and vice versa."""
+    today = today or date.today()
+    queryset = Profile.objects.exclude(user_id=profile.user_id)
+
+    # Gender, both ways
+    if profile.preferred_gender != 'A':
+        queryset = queryset.filter(gender=profile.preferred_gender)
+    queryset = queryset.filter(preferred_gender__in=['A', profile.gender])
+
+    # Candidate's age within our range; profiles without a birth date are kept
+    oldest = years_before(today, profile.max_age_preference + 1) + timedelta(days=1)
+    youngest = years_before(today, profile.min_age_preference)
+    queryset = queryset.filter(
+        Q(birth_date__isnull=True) | Q(birth_date__gte=oldest, birth_date__lte=youngest)
+    )
+
+    # Our age within the candidate's range
+    if profile.birth_date:
+        age = age_on(profile.birth_date, today)
+        queryset = queryset.filter(min_age_preference__lte=age, max_age_preference__gte=age)
+
+    # Distance, both ways; only possible once the profile has coordinates
+    if profile.latitude is not None and profile.longitude is not None:
+        queryset = geo.within_radius(
+            queryset, profile.latitude, profile.longitude, profile.max_distance
+        ).filter(distance_km__lte=F('max_distance'))
+
+    return queryset
+
+
+def build_feed(user):
+    """(Re)build and store the ranked candidate list for `user`."""
+    feed, _ = Feed.objects.get_or_create(user=user)
+    feed.entries.all().delete()
+
+    profile = Profile.objects.filter(user=user).first()
+    if profile is None:
+        feed.save()
+        return feed
+
+    # Users already liked or passed are dropped in memory (see api.seen); a
+    # heavy swiper's first batch may be mostly seen, so more are read to fill the feed
+    bloom = seen.load(user.id)
+    queryset = (
+        compatible_profiles(profile)
+        .exclude(user_id__in=hidden.hidden_user_ids(user.id))
+        .order_by('-last_active', 'id')
+        .values_list(*scoring.COLUMNS)
+    )
+    user_id = scoring.COLUMNS.index('user_id')
+    rows, unseen = [], 0
+    for start in range(0, FEED_BATCHES * FEED_CANDIDATES, FEED_CANDIDATES):
+        batch = list(queryset[start:start + FEED_CANDIDATES])
+        rows += batch
+        unseen += int((~bloom.contains([row[user_id] for row in batch])).sum())
+        if len(batch) < FEED_CANDIDATES or unseen >= FEED_SIZE:
+            break
+    candidates = scoring.columns(rows)
+    scores = scoring.score(scoring.profile_columns(profile), candidates)
+    entries = FeedEntry.objects.bulk_create([
+        FeedEntry(feed=feed, profile_id=int(candidates['id'][index]), score=float(scores[index]))
+        for index in seen.best_unseen(user.id, candidates['user_id'], scores, FEED_SIZE, bloom)
+    ])
+    feed.size = len(entries)
+    feed.save()
+    return feed
+
+
+def get_feed(user):
+    feed = (
+        Feed.objects.filter(user=user, built_at__gte=timezone.now() - FEED_TTL)
+        .annotate(remaining=Count('entries'))
+        .first()
+    )
+    # A feed that was built short stays as it is until profiles change
+    if feed is None or feed.remaining < min(feed.size, FEED_LOW_WATER):
+        feed = build_feed(user)
+    return feed
+
+
+def feed_queryset(user):
+    """Profiles in `user`'s stored feed, annotated with their `feed_score`."""
+    feed = get_feed(user)
+    queryset = (
+        Profile.objects.filter(feed_entries__feed=feed)
+        .annotate(feed_score=F('feed_entries__score'))
+        .select_related('user')
+    )
+    excluded = hidden.hidden_user_ids(user.id)
+    if excluded:
+        queryset = queryset.exclude(user_id__in=excluded)
+    return queryset
+
+
+def refresh_profile_on_commit(profile_id):
+    """`refresh_profile` once the saving transaction commits, so the fan-out is not part of it."""
+    def refresh():
+        profile = Profile.objects.filter(pk=profile_id).first()
+        if profile is not None:
+            refresh_profile(profile)
+    transaction.on_commit(refresh)
+
+
+def refresh_profile(profile):
+    """
+    Re-place a changed profile in other users' feeds and invalidate its own.
+
+    It is placed in at most FEED_REFRESH_LIMIT feeds, of the most recently
+    active viewers; the others find it when their feed is next rebuilt.
+    """
+    FeedEntry.objects.filter(profile=profile).delete()
+    Feed.objects.filter(user_id=profile.user_id).delete()
+
+    # Users with a stored feed the profile belongs in, as (feed id, *scoring.COLUMNS)
+    rows = list(
+        compatible_profiles(profile)
+        .filter(user__feed__isnull=False)
+        .exclude(user__in=Like.objects.filter(to_user_id=profile.user_id).values('from_user'))
+        .exclude(user__in=Pass.objects.filter(to_user_id=profile.user_id).values('from_user'))
+        .exclude(user__in=UserBlock.objects.filter(blocked_id=profile.user_id).values('blocker'))
+        .exclude(user__in=UserBlock.objects.filter(blocker_id=profile.user_id).values('blocked'))
+        .exclude(user__in=Report.objects.filter(reported_id=profile.user_id).values('reporter'))
+        .order_by('-last_active')
+        .values_list('user__feed__id', *scoring.COLUMNS)[:FEED_REFRESH_LIMIT]
+    )
+    # One candidate scored for every viewer at once
+    scores = scoring.score(scoring.columns([row[1:] for row in rows]), scoring.profile_columns(profile))
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(feed_id=row[0], profile=profile, score=float(score))
+            for row, score in zip(rows, scores)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def discard(user_id, profile_user_ids):
+    """Drop profiles of `profile_user_ids` from `user_id`'s feed."""
+    FeedEntry.objects.filter(feed__user_id=user_id, profile__user_id__in=profile_user_ids).delete()
@@ -0,0 +1,64 @@
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from . import geo, search
+from .models import Profile
+
+
+class RadiusFilter(filters.BaseFilterBackend):
+    """
+    `?within_km=N` keeps profiles within N km of `?lat=&lon=`, or of the
+    caller's own coordinates when no point is given.
+    """
+    radius_param = 'within_km'
+    max_radius_km = 500
+
+    def filter_queryset(self, request, queryset, view):
+        radius = request.query_params.get(self.radius_param)
+        if radius is None:
+            return queryset
+
+        try:
+            radius = float(radius)
+            if 'lat' in request.query_params or 'lon' in request.query_params:
+                latitude = float(request.query_params['lat'])
+                longitude = float(request.query_params['lon'])
+            else:
+                latitude, longitude = (
+                    Profile.objects.filter(user=request.user)
+                    .values_list('latitude', 'longitude')
+                    .get()
+                )
+        except (KeyError, ValueError, TypeError, Profile.DoesNotExist):
+            raise ValidationError({self.radius_param: 'A numeric radius and a valid lat/lon are required.'})
+
+        if latitude is None or longitude is None:
+            raise ValidationError({self.radius_param: 'Set your location or pass lat and lon.'})
+        if not (0 < radius <= self.max_radius_km and -90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({self.radius_param: f'Radius must be between 0 and {self.max_radius_km} km.'})
+
+        return geo.within_radius(queryset, latitude, longitude, radius)
+
+
+class ProfileSearchFilter(filters.BaseFilterBackend):
+    """
+    `?search=terms` keeps profiles whose username or location match every
+    term, looked up in the index kept by api.search.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search.search(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Username or location words, matched by prefix.',
+                'schema': {'type': 'string'},
+            },
+        ]
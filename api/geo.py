@@ -0,0 +1,114 @@
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 12
+MAX_CELLS = 16
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Height and width of a geohash cell in degrees."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon); longitudes may fall outside ±180."""
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    dlon = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return (
+        max(latitude - dlat, -90.0),
+        min(latitude + dlat, 90.0),
+        longitude - dlon,
+        longitude + dlon,
+    )
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Smallest set of geohash prefixes (at most MAX_CELLS) covering the radius."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.ceil((max_lat - min_lat) / height) + 1
+        cols = math.ceil(min(max_lon - min_lon, 360.0) / width) + 1
+        if rows * cols <= MAX_CELLS:
+            break
+    cells = set()
+    for row in range(rows):
+        lat = min(min_lat + row * height, max_lat)
+        for col in range(cols):
+            lon = min(min_lon + col * width, max_lon)
+            cells.add(encode(lat, (lon + 180.0) % 360.0 - 180.0, precision))
+    return cells
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from a point to each row's coordinates."""
+    dlat = Radians(F('latitude') - latitude)
+    dlon = Radians(F('longitude') - longitude)
+    a = (
+        Power(Sin(dlat / 2), 2)
+        + math.cos(math.radians(latitude)) * Cos(Radians(F('latitude'))) * Power(Sin(dlon / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Filter profiles within `radius_km` of a point and annotate `distance_km`.
+
+    Geohash prefix ranges select candidate cells from the index, the bounding
+    box trims them, and the exact haversine distance decides.
+    """
+    cells = Q()
+    for cell in covering_cells(latitude, longitude, radius_km):
+        # A range instead of startswith so both SQLite and Postgres use the index
+        cells |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    if max_lon - min_lon >= 360.0:
+        longitudes = Q()
+    elif min_lon < -180.0 or max_lon > 180.0:
+        # The box wraps around the antimeridian
+        longitudes = Q(longitude__gte=(min_lon + 180.0) % 360.0 - 180.0) | Q(longitude__lte=(max_lon + 180.0) % 360.0 - 180.0)
+    else:
+        longitudes = Q(longitude__gte=min_lon, longitude__lte=max_lon)
+
+    return (
+        queryset.filter(cells, longitudes, latitude__gte=min_lat, latitude__lte=max_lat)
+        .annotate(distance_km=distance_expression(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+    )
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from .models import Report, UserBlock
+
+HIDDEN_CACHE_TIMEOUT = getattr(settings, 'HIDDEN_CACHE_TIMEOUT', 60 * 60)
+
+
+def cache_key(user_id):
+    return f'hidden:{user_id}'
+
+
+def hidden_user_ids(user_id):
+    """
+    Users hidden from `user_id`: blocked by them, blocking them, or reported by them.
+
+    Served from the cache and kept correct by the UserBlock/Report signals.
+    Read from the primary even under replica_reads, as a lagging replica's
+    answer would otherwise be cached for HIDDEN_CACHE_TIMEOUT.
+    """
+    hidden = cache.get(cache_key(user_id))
+    if hidden is None:
+        hidden = set()
+        blocks = UserBlock.objects.using(DEFAULT_DB_ALIAS).filter(Q(blocker_id=user_id) | Q(blocked_id=user_id))
+        for blocker_id, blocked_id in blocks.values_list('blocker_id', 'blocked_id'):
+            hidden.add(blocked_id if blocker_id == user_id else blocker_id)
+        hidden.update(Report.objects.using(DEFAULT_DB_ALIAS).filter(reporter_id=user_id).values_list('reported_id', flat=True))
+        hidden = frozenset(hidden)
+        cache.set(cache_key(user_id), hidden, HIDDEN_CACHE_TIMEOUT)
+    return hidden
+
+
+def invalidate(*user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
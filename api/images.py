@@ -0,0 +1,178 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps, features
+
+from .media import HASHED_NAME
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; smaller uploads are never upscaled
+VARIANT_SIZES = {
+    'thumbnail': 160,
+    'card': 640,
+    'full': 1280,
+}
+
+ENCODINGS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Re-encoding options for the stripped original, in its own format
+ORIGINAL_OPTIONS = {
+    'JPEG': {'quality': 95},
+    'WEBP': {'quality': 95},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def available_encodings():
+    if features.check('webp'):
+        return ENCODINGS
+    return {name: encoding for name, encoding in ENCODINGS.items() if name != 'webp'}
+
+
+def render_variants(source):
+    """Encode every variant of the image in `source`; returns {variant: {format: bytes}}."""
+    with Image.open(source) as image:
+        # Apply the EXIF orientation; re-encoding below drops the metadata itself
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        rendered = {}
+        for variant, size in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            rendered[variant] = {}
+            for extension, (image_format, options) in available_encodings().items():
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, **options)
+                rendered[variant][extension] = buffer.getvalue()
+        return rendered
+
+
+def strip_metadata(source):
+    """Re-encode the image in `source` upright and without EXIF or XMP; None if it has neither."""
+    with Image.open(source) as image:
+        if not image.getexif() and 'xmp' not in image.info:
+            return None
+        # Phone cameras' multi-picture JPEGs are saved as their first, plain JPEG frame
+        image_format = 'JPEG' if image.format == 'MPO' else image.format
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+        options = dict(ORIGINAL_OPTIONS.get(image_format, {}))
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+
+def _original_name(source):
+    """`source` without its content hash, for saving a new version of it."""
+    match = HASHED_NAME.search(source)
+    if match is None:
+        return source
+    return source[:match.start()] + posixpath.splitext(source)[1]
+
+
+def _delete_unused(name):
+    # Content-addressed names can be shared by several profiles
+    if not Profile.objects.filter(profile_picture=name).exists():
+        default_storage.delete(name)
+
+
+def process_profile_picture(profile_id):
+    """Render and store the variants of a profile's current picture."""
+    row = Profile.objects.filter(pk=profile_id).values('profile_picture', 'picture_variants').first()
+    if row is None or not row['profile_picture']:
+        return
+    source, previous = row['profile_picture'], row['picture_variants'] or {}
+    if previous.get('source') == source:
+        return
+
+    with default_storage.open(source) as file:
+        rendered = render_variants(file)
+        file.seek(0)
+        # The upload is served as profile_picture too, so it loses its EXIF (GPS, camera) as well
+        stripped = strip_metadata(file)
+    picture = source
+    if stripped is not None:
+        picture = default_storage.save(_original_name(source), ContentFile(stripped))
+
+    directory = posixpath.join(posixpath.dirname(source), 'variants', str(profile_id))
+    variants = {'source': picture}
+    for variant, encoded in rendered.items():
+        variants[variant] = {
+            extension: default_storage.save(posixpath.join(directory, f'{variant}.{extension}'), ContentFile(data))
+            for extension, data in encoded.items()
+        }
+
+    # Only publish if the picture did not change again meanwhile
+    updated = Profile.objects.filter(pk=profile_id, profile_picture=source).update(
+        profile_picture=picture,
+        picture_variants=variants,
+        cache_version=F('cache_version') + 1,
+    )
+    if picture != source:
+        _delete_unused(source if updated else picture)
+    stale, kept = (previous, variants) if updated else (variants, previous)
+    kept_names = {name for variant in VARIANT_SIZES for name in kept.get(variant, {}).values()}
+    for variant in VARIANT_SIZES:
+        for name in stale.get(variant, {}).values():
+            # Content-addressed names can be shared by the old and new variants
+            if name not in kept_names:
+                default_storage.delete(name)
+
+
+def _process_in_worker(profile_id):
+    close_old_connections()
+    try:
+        process_profile_picture(profile_id)
+    except Exception:
+        logger.exception('Processing the picture of profile %s failed', profile_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue(profile_id):
+    """Process the picture in a background worker once the current transaction commits."""
+    if not getattr(settings, 'PROFILE_PICTURE_ASYNC', True):
+        transaction.on_commit(lambda: process_profile_picture(profile_id))
+        return
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PROFILE_PICTURE_WORKERS', 2),
+                thread_name_prefix='profile-pictures',
+            )
+    transaction.on_commit(lambda: _executor.submit(_process_in_worker, profile_id))
+
+
+def variant_urls(variants):
+    urls = {}
+    for variant in VARIANT_SIZES:
+        for extension, name in variants.get(variant, {}).items():
+            urls.setdefault(variant, {})[extension] = default_storage.url(name)
+    return urls
@@ -0,0 +1,118 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the request duration histogram buckets
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+_recorder = ContextVar('query_recorder', default=None)
+_lock = threading.Lock()
+_stats = {}
+
+
+def shape(sql):
+    """`sql` with IN lists collapsed, so queries differing only in parameters compare equal."""
+    return IN_LIST.sub('(%s, ...)', sql)
+
+
+class QueryRecorder:
+    """Counts and times the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold):
+        """Query shapes run at least `threshold` times, the signature of an N+1."""
+        return {sql: count for sql, count in self.shapes.items() if count >= threshold}
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Installed on every connection; records queries while a request is being recorded."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        recorder.count += 1
+        recorder.duration += elapsed
+        recorder.shapes[shape(sql)] += 1
+        if elapsed * 1000 >= getattr(settings, 'INSTRUMENTATION_SLOW_QUERY_MS', 100):
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql)
+
+
+def install(connection):
+    # The wrapper list outlives reconnects, so add it once. It goes first, as
+    # connection.execute_wrapper() blocks pop the last wrapper on exit.
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+@contextmanager
+def recording():
+    """
+    Record the queries run in this context, including from sync_to_async
+    threads, which inherit it.
+    """
+    recorder = QueryRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def record(view, duration, recorder, n_plus_one):
+    """Add one request of `view` to the per-view aggregates."""
+    bucket = next((index for index, bound in enumerate(BUCKETS_MS) if duration * 1000 <= bound), len(BUCKETS_MS))
+    with _lock:
+        stats = _stats.get(view)
+        if stats is None:
+            stats = _stats[view] = {
+                'count': 0, 'duration': 0.0, 'db_duration': 0.0, 'queries': 0, 'n_plus_one': 0,
+                'histogram': [0] * (len(BUCKETS_MS) + 1),
+            }
+        stats['count'] += 1
+        stats['duration'] += duration
+        stats['db_duration'] += recorder.duration
+        stats['queries'] += recorder.count
+        stats['n_plus_one'] += bool(n_plus_one)
+        stats['histogram'][bucket] += 1
+
+
+def request_stats():
+    """Per-view request counts, means and duration histograms of this process since it started."""
+    with _lock:
+        snapshot = {view: {**stats, 'histogram': list(stats['histogram'])} for view, stats in _stats.items()}
+    labels = [str(bound) for bound in BUCKETS_MS] + ['+Inf']
+    return {
+        view: {
+            'count': stats['count'],
+            'mean_ms': stats['duration'] * 1000 / stats['count'],
+            'mean_db_ms': stats['db_duration'] * 1000 / stats['count'],
+            'mean_queries': stats['queries'] / stats['count'],
+            'n_plus_one': stats['n_plus_one'],
+            # Requests per bucket, keyed by the bucket's upper bound in milliseconds
+            'histogram_ms': dict(zip(labels, stats['histogram'])),
+        }
+        for view, stats in sorted(snapshot.items())
+    }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
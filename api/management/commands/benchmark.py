@@ -0,0 +1,108 @@
+import math
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from api import bench
+from api.models import Profile
+from api.management.commands.seed_data import CITIES
+
+DEFAULT_BUDGETS = Path(settings.BASE_DIR) / 'api' / 'bench_budgets.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles, throughput and SQL queries per request of the main '
+        'endpoints against data from seed_data, and fail when one is over its stored budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seeded users.')
+        parser.add_argument('--users', type=int, default=20, help='Seeded users to send requests as.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only run these endpoints.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS), help='JSON file of per-endpoint budgets.')
+        parser.add_argument(
+            '--update-budgets', action='store_true',
+            help='Store this run as the new budgets instead of checking against them.',
+        )
+        parser.add_argument('--headroom', type=float, default=2.0, help='Latency headroom of updated budgets.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user_ids = list(
+            User.objects.filter(username__startswith=options['prefix'], profile__isnull=False)
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not user_ids:
+            raise CommandError(f"No users named {options['prefix']}*; run seed_data first")
+        users = list(User.objects.filter(id__in=rng.sample(user_ids, min(options['users'], len(user_ids)))))
+        clients = [
+            Client(raise_request_exception=False, headers={'Authorization': f'Bearer {bench.access_token(user)}'})
+            for user in users
+        ]
+        profile_ids = list(Profile.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+
+        # name -> (method, path) of a request, drawn anew for every request
+        endpoints = {
+            'profile-list': lambda: ('GET', reverse('api:profile-list')),
+            'profile-detail': lambda: ('GET', reverse('api:profile-detail', args=[rng.choice(profile_ids)])),
+            'profile-search': lambda: ('GET', reverse('api:profile-list') + f'?search={rng.choice(CITIES)[0][:4]}'),
+            'like': lambda: ('POST', reverse('api:like-profile', args=[rng.choice(profile_ids)])),
+            'matches': lambda: ('GET', reverse('api:matches')),
+            'likes': lambda: ('GET', reverse('api:likes')),
+        }
+        selected = options['endpoints'] or list(endpoints)
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<15} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'5xx':>4}"
+        )
+        for name in selected:
+            # One untimed request per user warms feeds and caches the way traffic would
+            for client in clients:
+                bench.measure(client, *endpoints[name]())
+
+            latencies, queries, errors = [], [], 0
+            for number in range(options['requests']):
+                latency, query_count, status_code = bench.measure(clients[number % len(clients)], *endpoints[name]())
+                latencies.append(latency)
+                queries.append(query_count)
+                errors += status_code >= 500
+            summary = bench.summarize(latencies, sum(latencies))
+            summary['queries'] = max(queries)
+            summary['errors'] = errors
+            results[name] = summary
+            self.stdout.write(
+                f"{name:<15} {summary['rps']:>8.1f} {summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} "
+                f"{summary['p99_ms']:>8.1f} {summary['queries']:>7} {errors:>4}"
+            )
+
+        if options['update_budgets']:
+            budgets = bench.load_budgets(options['budgets'])
+            for name, summary in results.items():
+                budgets[name] = {
+                    'p95_ms': math.ceil(summary['p95_ms'] * options['headroom']),
+                    'queries': summary['queries'],
+                }
+            bench.save_budgets(options['budgets'], budgets)
+            self.stdout.write(f"Budgets written to {options['budgets']}")
+            return
+
+        failures = [f"{name}: {summary['errors']} server errors" for name, summary in results.items() if summary['errors']]
+        failures += [
+            f'{name}: {measurement} {value:.1f} over budget {budget}'
+            for name, measurement, value, budget in bench.over_budget(results, bench.load_budgets(options['budgets']))
+        ]
+        if failures:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
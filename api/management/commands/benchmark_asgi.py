@@ -0,0 +1,65 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from api import bench
+from api.models import Profile
+
+# (method, sync url name, async url name) per endpoint
+ENDPOINTS = {
+    'profiles': ('GET', 'api:profile-list', 'api:async-profile-list'),
+    'matches': ('GET', 'api:matches', 'api:async-matches'),
+    # After the first request every like is "Already liked", through the same locking path
+    'like': ('POST', 'api:like-profile', 'api:async-like-profile'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the sync views under gunicorn sync workers '
+        'with the async views under uvicorn workers, against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User to authenticate the requests as.')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), dest='endpoints')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for both servers.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']}")
+        headers = {'Authorization': f'Bearer {bench.access_token(user)}'}
+        target = Profile.objects.exclude(user=user).values_list('id', flat=True).first()
+
+        # gunicorn and the settings both read the worker count from WEB_CONCURRENCY
+        workers = str(options['workers'])
+        modes = {
+            'wsgi': [sys.executable, '-m', 'gunicorn', 'shiputy.wsgi:application'],
+            'asgi': [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'shiputy' / 'gunicorn_asgi.py')],
+        }
+
+        self.stdout.write(f"{'endpoint':<10} {'mode':<5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for endpoint in options['endpoints'] or sorted(ENDPOINTS):
+            method, *names = ENDPOINTS[endpoint]
+            for mode, name in zip(modes, names):
+                path = reverse(name, args=[target] if endpoint == 'like' else [])
+                port = bench.free_port()
+                command = [*modes[mode], '--bind', f'127.0.0.1:{port}']
+                with bench.server(command, port, env={'SERVER_MODE': mode, 'WEB_CONCURRENCY': workers}):
+                    # Warm caches, connections and the feed before measuring
+                    bench.http_load(port, method, path, headers, options['concurrency'], options['concurrency'])
+                    latencies, elapsed, errors = bench.http_load(
+                        port, method, path, headers, options['requests'], options['concurrency']
+                    )
+                summary = bench.summarize(latencies, elapsed)
+                self.stdout.write(
+                    f"{endpoint:<10} {mode:<5} {summary['rps'] or 0:>8.1f} {summary['p50_ms'] or 0:>8.1f} "
+                    f"{summary['p95_ms'] or 0:>8.1f} {summary['p99_ms'] or 0:>8.1f} {errors:>6}"
+                )
@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+from api import bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of opening a database connection for every request, '
+        'against keeping it between requests or borrowing it from a pool (Postgres only).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=1, help='Queries run by each request.')
+
+    def handle(self, *args, **options):
+        base = connections[options['database']].settings_dict
+        base_options = {name: value for name, value in base['OPTIONS'].items() if name != 'pool'}
+        # settings overrides per strategy
+        strategies = {
+            'connect': {'CONN_MAX_AGE': 0, 'OPTIONS': base_options},
+            'persistent': {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': base_options},
+        }
+        if base['ENGINE'] == 'django.db.backends.postgresql':
+            pool = base['OPTIONS'].get('pool') or {**settings.DATABASE_POOL_OPTIONS, 'min_size': 1}
+            strategies['pool'] = {'CONN_MAX_AGE': 0, 'OPTIONS': {**base_options, 'pool': pool}}
+
+        self.stdout.write(f"{'strategy':<11} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'saved ms':>9}")
+        baseline = None
+        for name, overrides in strategies.items():
+            latencies = self.run(options['database'], name, {**base, **overrides}, options)
+            mean = statistics.mean(latencies) * 1000
+            baseline = mean if baseline is None else baseline
+            summary = bench.summarize(latencies, sum(latencies))
+            self.stdout.write(
+                f"{name:<11} {mean:>8.3f} {summary['p50_ms']:>8.3f} {summary['p95_ms']:>8.3f} {baseline - mean:>9.3f}"
+            )
+
+    def run(self, alias, name, settings_dict, options):
+        """Latencies of requests on a connection of their own, as Django's request signals manage it."""
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, f'{alias}-{name}')
+        latencies = []
+        try:
+            # The first request pays for opening the pool or the persistent connection
+            for number in range(options['requests'] + 1):
+                start = time.perf_counter()
+                wrapper.close_if_unusable_or_obsolete()
+                with wrapper.cursor() as cursor:
+                    for _ in range(options['queries']):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                wrapper.close_if_unusable_or_obsolete()
+                if number:
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            wrapper.close()
+            if settings_dict['OPTIONS'].get('pool'):
+                wrapper.close_pool()
+        return latencies
@@ -0,0 +1,82 @@
+import heapq
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import bench, scoring
+from api.feed import FEED_SIZE, years_before
+from api.management.commands.seed_data import CITIES
+from api.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Time ranking the candidates of a viewer who has not swiped yet the way build_feed does, with '
+        'scoring.score and top_k, against scoring them one by one in Python, on synthetic profiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=10000)
+        parser.add_argument('--top', type=int, default=FEED_SIZE, help='Candidates kept per feed.')
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        viewer = self.profile(rng, now, 0)
+        candidates = [self.profile(rng, now, number) for number in range(1, options['candidates'] + 1)]
+        # What values_list(*scoring.COLUMNS) returns for them
+        rows = [tuple(getattr(candidate, name) for name in scoring.COLUMNS) for candidate in candidates]
+        top = options['top']
+
+        def vectorized():
+            columns = scoring.columns(rows)
+            scores = scoring.score(scoring.profile_columns(viewer), columns, now)
+            return columns['id'][scoring.top_k(scores, top)].tolist()
+
+        def python():
+            best = heapq.nlargest(top, candidates, key=lambda candidate: scoring.score_row(viewer, candidate, now))
+            return [candidate.id for candidate in best]
+
+        self.stdout.write(f"{'method':<11} {'p50 ms':>8} {'p95 ms':>8} {'us/candidate':>12}")
+        results = {}
+        for name, rank in (('python', python), ('vectorized', vectorized)):
+            latencies = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                results[name] = rank()
+                latencies.append(time.perf_counter() - start)
+            summary = bench.summarize(latencies, sum(latencies))
+            per_candidate = summary['p50_ms'] * 1000 / len(candidates)
+            self.stdout.write(f"{name:<11} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {per_candidate:>12.3f}")
+            results[f'{name}_ms'] = summary['p50_ms']
+
+        self.stdout.write(f"Speedup: {results['python_ms'] / results['vectorized_ms']:.1f}x")
+        # Ties may be broken differently; the chosen sets should not be
+        overlap = len(set(results['python']) & set(results['vectorized']))
+        self.stdout.write(f"Top {top} agreement: {overlap}/{len(results['python'])}")
+
+    def profile(self, rng, now, number):
+        city = rng.choices(CITIES, weights=[city[3] for city in CITIES])[0]
+        min_age = rng.randint(18, 35)
+        located = rng.random() < 0.9
+        return Profile(
+            id=number,
+            user_id=number,
+            birth_date=years_before(now.date(), rng.randint(18, 50)) if rng.random() < 0.95 else None,
+            min_age_preference=min_age,
+            max_age_preference=min_age + rng.randint(5, 20),
+            latitude=city[1] + rng.uniform(-0.2, 0.2) if located else None,
+            longitude=city[2] + rng.uniform(-0.2, 0.2) if located else None,
+            max_distance=rng.choice([10, 25, 50, 100]),
+            last_active=now - timedelta(hours=rng.expovariate(1 / 48)),
+            profile_completion=rng.choice([40, 60, 80, 100]),
+            is_verified=rng.random() < 0.3,
+            is_premium=rng.random() < 0.1,
+            likes_received=int(rng.paretovariate(1.5)) - 1,
+            blocks_received=int(rng.random() < 0.05),
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.images import process_profile_picture
+from api.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Render resized variants for profile pictures that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every picture.')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if options['all']:
+            profiles.update(picture_variants={})
+
+        processed = 0
+        for profile in profiles.only('id', 'profile_picture', 'picture_variants').iterator():
+            if profile.picture_variants.get('source') != profile.profile_picture.name:
+                process_profile_picture(profile.pk)
+                processed += 1
+        self.stdout.write(f'Processed {processed} profile pictures')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the profiles\' like, match and block counters from the source tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = counters.rebuild(options['batch_size'])
+        self.stdout.write(f'Repaired the counters of {repaired} profiles')
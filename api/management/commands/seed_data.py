@@ -0,0 +1,194 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from api import counters, geo, search, seen
+from api.feed import years_before
+from api.matching import record_matches
+from api.models import Like, Match, Profile, Report, UserBlock
+
+# (name, latitude, longitude, share of users)
+CITIES = [
+    ('Istanbul', 41.01, 28.98, 0.35),
+    ('Ankara', 39.93, 32.86, 0.14),
+    ('Izmir', 38.42, 27.14, 0.10),
+    ('Bursa', 40.19, 29.06, 0.06),
+    ('Antalya', 36.90, 30.70, 0.06),
+    ('Adana', 37.00, 35.32, 0.05),
+    ('Konya', 37.87, 32.48, 0.05),
+    ('Samsun', 41.29, 36.33, 0.05),
+    ('Gaziantep', 37.07, 37.38, 0.04),
+    ('Kayseri', 38.73, 35.49, 0.04),
+    ('Eskisehir', 39.78, 30.52, 0.03),
+    ('Trabzon', 41.00, 39.72, 0.03),
+]
+GENDERS = (['M', 'F', 'O'], [48, 48, 4])
+BIOS = [
+    'Coffee first, then adventures.',
+    'Weekend hiker and amateur cook.',
+    'Looking for someone to share playlists with.',
+    'Bookworm, cat person, terrible at karaoke.',
+    'Always planning the next trip.',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset for benchmarks: users with profiles spread over cities, '
+        'popularity-skewed likes, the resulting matches, and some blocks and reports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=10000)
+        parser.add_argument('--likes', type=float, default=20, help='Average likes given per user.')
+        parser.add_argument('--blocks', type=float, default=0.02, help='Share of users who block someone.')
+        parser.add_argument('--reports', type=float, default=0.005, help='Share of users who report someone.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seeded users.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible datasets.')
+        parser.add_argument('--password', default='seedpass123', help='Password of every seeded user.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded users first.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            self.stdout.write(f'Deleted {deleted} rows of earlier seeded data')
+
+        users = self.seed_users(prefix, options['profiles'], options['password'])
+        self.stdout.write(f'Created {len(users)} users and profiles')
+        likes = self.seed_likes(users, options['likes'])
+        self.stdout.write(f'Created {likes} likes')
+        matches = self.seed_matches(prefix)
+        self.stdout.write(f'Created {matches} matches')
+        blocks, reports = self.seed_blocks_and_reports(users, options['blocks'], options['reports'])
+        self.stdout.write(f'Created {blocks} blocks and {reports} reports')
+        # The rows above were bulk created, past the signals that count them
+        counters.rebuild(self.batch_size)
+        # Nor do the likers' seen filters hold these likes; they are rebuilt on next use
+        seen.reset([user_id for user_id, _, _ in users])
+
+    def batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def seed_users(self, prefix, count, password):
+        """Create users and profiles; returns [(user_id, gender, preferred_gender)]."""
+        rng = self.rng
+        # Hashing once keeps seeding fast; every user shares the password
+        hashed = make_password(password)
+        start = User.objects.filter(username__startswith=prefix).count()
+        today = timezone.now().date()
+        now = timezone.now()
+        city_weights = [city[3] for city in CITIES]
+
+        seeded = []
+        for batch in self.batches(range(start, start + count)):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    [User(username=f'{prefix}{number}', password=hashed) for number in batch]
+                )
+                profiles = []
+                for user in users:
+                    gender = rng.choices(*GENDERS)[0]
+                    opposite = {'M': 'F', 'F': 'M'}.get(gender, rng.choice(['M', 'F']))
+                    preferred = rng.choices([opposite, 'A', gender if gender != 'O' else 'A'], [85, 10, 5])[0]
+                    age = int(rng.triangular(18, 60, 27))
+                    city, latitude, longitude, _ = rng.choices(CITIES, city_weights)[0]
+                    latitude += rng.gauss(0, 0.08)
+                    longitude += rng.gauss(0, 0.08)
+                    profile = Profile(
+                        user=user,
+                        bio=rng.choice(BIOS) if rng.random() < 0.7 else '',
+                        birth_date=years_before(today, age) - timedelta(days=rng.randrange(365)),
+                        gender=gender,
+                        preferred_gender=preferred,
+                        location=city,
+                        latitude=latitude,
+                        longitude=longitude,
+                        geohash=geo.encode(latitude, longitude),
+                        phone_number=f'+90555{rng.randrange(10 ** 7):07d}' if rng.random() < 0.5 else '',
+                        is_verified=rng.random() < 0.2,
+                        is_premium=rng.random() < 0.1,
+                        min_age_preference=max(18, age - rng.randint(2, 8)),
+                        max_age_preference=age + rng.randint(2, 10),
+                        max_distance=rng.choices([10, 25, 50, 100], [15, 35, 35, 15])[0],
+                        last_active=now - timedelta(hours=rng.expovariate(1 / 72)),
+                        search_text=search.document(user.username, city),
+                    )
+                    # bulk_create skips save(), which maintains these
+                    profile.profile_completion = profile.compute_completion()
+                    profiles.append(profile)
+                profiles = Profile.objects.bulk_create(profiles)
+                search.index([(profile.pk, profile.search_text) for profile in profiles])
+            seeded.extend((profile.user_id, profile.gender, profile.preferred_gender) for profile in profiles)
+        return seeded
+
+    def seed_likes(self, users, average):
+        """Likes toward users of the preferred gender, skewed toward a popular few."""
+        rng = self.rng
+        # Pareto popularity: a small share of profiles receives most likes
+        pools = {}
+        for gender in ('M', 'F', 'A'):
+            members = [user_id for user_id, user_gender, _ in users if gender in ('A', user_gender)]
+            weights = [rng.paretovariate(1.2) for _ in members]
+            pools[gender] = (members, list(accumulate(weights)))
+
+        created = 0
+        for batch in self.batches(users):
+            likes = []
+            for user_id, _, preferred in batch:
+                members, cum_weights = pools[preferred]
+                count = min(int(rng.expovariate(1 / average)), len(members) - 1) if average else 0
+                targets = set(rng.choices(members, cum_weights=cum_weights, k=count)) - {user_id}
+                likes.extend(Like(from_user_id=user_id, to_user_id=target) for target in targets)
+            Like.objects.bulk_create(likes, ignore_conflicts=True)
+            created += len(likes)
+        return created
+
+    def seed_matches(self, prefix):
+        """A match, with its UserMatch rows, for every reciprocated seeded like."""
+        reciprocated = (
+            Like.objects.filter(from_user__username__startswith=prefix, from_user_id__lt=F('to_user_id'))
+            .filter(Exists(Like.objects.filter(from_user_id=OuterRef('to_user_id'), to_user_id=OuterRef('from_user_id'))))
+            .exclude(Exists(Match.objects.filter(user1_id=OuterRef('from_user_id'), user2_id=OuterRef('to_user_id'))))
+            .values_list('from_user_id', 'to_user_id')
+        )
+        pairs = list(reciprocated)
+        for batch in self.batches(pairs):
+            with transaction.atomic():
+                matches = Match.objects.bulk_create([Match(user1_id=user1, user2_id=user2) for user1, user2 in batch])
+                record_matches(matches)
+        return len(pairs)
+
+    def seed_blocks_and_reports(self, users, block_share, report_share):
+        rng = self.rng
+        user_ids = [user_id for user_id, _, _ in users]
+        blocks = [
+            UserBlock(blocker_id=user_id, blocked_id=rng.choice(user_ids))
+            for user_id in user_ids if rng.random() < block_share
+        ]
+        blocks = [block for block in blocks if block.blocker_id != block.blocked_id]
+        reports = [
+            Report(
+                reporter_id=user_id,
+                reported_id=rng.choice(user_ids),
+                reason=rng.choice(Report.REPORT_REASONS)[0],
+                description='Seeded report',
+            )
+            for user_id in user_ids if rng.random() < report_share
+        ]
+        reports = [report for report in reports if report.reporter_id != report.reported_id]
+        UserBlock.objects.bulk_create(blocks, ignore_conflicts=True, batch_size=self.batch_size)
+        Report.objects.bulk_create(reports, batch_size=self.batch_size)
+        return len(blocks), len(reports)
@@ -0,0 +1,208 @@
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import counters, events, feed, hidden, routers, seen
+from .models import Like, Match, Pass, Profile, UserMatch
+
+# Swipe actions
+LIKE = 'like'
+PASS = 'pass'
+
+# Outcomes of a swipe
+LIKED = 'liked'
+MATCHED = 'matched'
+PASSED = 'passed'
+ALREADY_LIKED = 'already_liked'
+NOT_FOUND = 'not_found'
+OWN_PROFILE = 'own_profile'
+
+
+def canonical_pair(user_a_id, user_b_id):
+    """Order a pair of user ids the way Match stores them (user1 < user2)."""
+    return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+
+def record_matches(matches):
+    """Create the per-user UserMatch rows of `matches`."""
+    UserMatch.objects.bulk_create(
+        [
+            UserMatch(user_id=user_id, other_user_id=other_user_id, match_id=match.id, created_at=match.created_at)
+            for match in matches
+            for user_id, other_user_id in ((match.user1_id, match.user2_id), (match.user2_id, match.user1_id))
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def insert_likes(from_user_id, to_user_ids):
+    """
+    Insert the likes of `from_user_id` that do not exist yet and return them.
+
+    One INSERT ... ON CONFLICT DO NOTHING RETURNING tells which rows were new
+    without a savepoint, even where the profile lock does not exclude a
+    concurrent like (SQLite). No signals are sent.
+    """
+    if not to_user_ids:
+        return []
+    connection = connections[router.db_for_write(Like)]
+    quote = connection.ops.quote_name
+    columns = [Like._meta.get_field(name).column for name in ('from_user', 'to_user', 'created_at')]
+    created_at = timezone.now()
+    params = []
+    for to_user_id in to_user_ids:
+        params += [from_user_id, to_user_id, connection.ops.adapt_datetimefield_value(created_at)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(Like._meta.db_table)} ({', '.join(map(quote, columns))}) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(to_user_ids))} "
+            f"ON CONFLICT DO NOTHING RETURNING {quote(Like._meta.pk.column)}, {quote(columns[1])}",
+            params,
+        )
+        rows = cursor.fetchall()
+
+    likes = []
+    for pk, to_user_id in rows:
+        like = Like(id=pk, from_user_id=from_user_id, to_user_id=to_user_id, created_at=created_at)
+        like._state.adding = False
+        like._state.db = connection.alias
+        likes.append(like)
+    return likes
+
+
+def like(from_user, profile_id):
+    """
+    Like the owner of `profile_id`, creating the match if the like is mutual.
+
+    Both profiles are locked in user id order, so two users liking each other
+    at the same moment serialize on the pair and exactly one of them sees the
+    other's like and creates the match. Unique constraints on Like and Match
+    back this up.
+    """
+    with transaction.atomic():
+        rows = (
+            Profile.objects.select_for_update()
+            .filter(Q(id=profile_id) | Q(user=from_user))
+            .order_by('user_id')
+            .values_list('id', 'user_id')
+        )
+        to_user_id = next((user_id for pk, user_id in rows if pk == profile_id), None)
+        if to_user_id is None or to_user_id in hidden.hidden_user_ids(from_user.id):
+            return NOT_FOUND
+        if to_user_id == from_user.id:
+            return OWN_PROFILE
+
+        liked_back = Like.objects.filter(from_user_id=to_user_id, to_user=from_user).exists()
+        # The insert is the check for an existing like
+        created = insert_likes(from_user.id, [to_user_id])
+        if not created:
+            return ALREADY_LIKED
+        # What Like.objects.create would have run: counters, seen filter, feed and events
+        post_save.send(Like, instance=created[0], created=True, update_fields=None, raw=False, using=created[0]._state.db)
+        if not liked_back:
+            return LIKED
+
+        # Both profiles are locked and the like is new, so the match is too
+        user1_id, user2_id = canonical_pair(from_user.id, to_user_id)
+        Match.objects.create(user1_id=user1_id, user2_id=user2_id)
+        return MATCHED
+
+
+def swipe_batch(from_user, swipes):
+    """
+    Apply a batch of `(profile_id, action)` swipes and return one outcome per swipe.
+
+    Runs a constant number of queries whatever the batch size: one to resolve
+    and lock the profiles, inserts for likes and passes, one for reciprocal likes, a bulk insert, a lookup and a bulk
+    insert of UserMatch rows for the new matches, one counter update, and a
+    read and an update of the seen filter.
+    """
+    profile_ids = {profile_id for profile_id, action in swipes}
+    hidden_users = hidden.hidden_user_ids(from_user.id)
+    with transaction.atomic():
+        owners = dict(
+            Profile.objects.select_for_update()
+            .filter(Q(id__in=profile_ids) | Q(user=from_user))
+            .order_by('user_id')
+            .values_list('id', 'user_id')
+        )
+        owners = {pk: user_id for pk, user_id in owners.items() if user_id not in hidden_users}
+        liked_ids = {owners[pid] for pid, action in swipes if action == LIKE and pid in owners}
+        passed_ids = {owners[pid] for pid, action in swipes if action == PASS and pid in owners}
+        liked_ids.discard(from_user.id)
+        passed_ids.discard(from_user.id)
+
+        # Outcomes come from the rows actually inserted, so a like that a
+        # concurrent request inserted first is neither counted nor published twice
+        new_likes = {like.to_user_id for like in insert_likes(from_user.id, list(liked_ids))}
+        already_liked = liked_ids - new_likes
+        Pass.objects.bulk_create(
+            [Pass(from_user=from_user, to_user_id=user_id) for user_id in passed_ids],
+            ignore_conflicts=True,
+        )
+
+        matched = set(
+            Like.objects.filter(from_user_id__in=new_likes, to_user=from_user)
+            .values_list('from_user_id', flat=True)
+        )
+        pairs = [canonical_pair(from_user.id, user_id) for user_id in matched]
+        Match.objects.bulk_create(
+            [Match(user1_id=user1_id, user2_id=user2_id) for user1_id, user2_id in pairs],
+            ignore_conflicts=True,
+        )
+        matches = []
+        if matched:
+            # bulk_create with ignore_conflicts does not return primary keys
+            matches = list(Match.objects.filter(
+                Q(user1=from_user, user2_id__in=matched) | Q(user2=from_user, user1_id__in=matched)
+            ))
+            record_matches(matches)
+            for match in matches:
+                events.match_created(match)
+        # bulk_create skips post_save, so count and publish here what the signals would
+        counters.adjust(counters.liked(from_user.id, new_likes) + counters.matched(matches))
+        seen.add(from_user.id, new_likes | passed_ids)
+        for user_id in new_likes:
+            events.like_created(from_user.id, user_id)
+
+    # Likewise drop the swiped profiles from the feed and pin the reads here
+    feed.discard(from_user.id, liked_ids | passed_ids)
+    if new_likes or passed_ids:
+        routers.pin_to_primary(from_user.id)
+
+    results, reported = [], set()
+    for profile_id, action in swipes:
+        user_id = owners.get(profile_id)
+        if user_id is None:
+            result = NOT_FOUND
+        elif user_id == from_user.id:
+            result = OWN_PROFILE
+        elif action == PASS:
+            result = PASSED
+        elif user_id in already_liked or (user_id, LIKE) in reported:
+            result = ALREADY_LIKED
+        elif user_id in matched:
+            result = MATCHED
+        else:
+            result = LIKED
+        reported.add((user_id, action))
+        results.append(result)
+    return results
+
+
+def received_likes(user_id):
+    """
+    Likes to `user_id` from users they have not liked back and who are not hidden from them.
+
+    A match needs likes both ways, so matched users are excluded too. Both the
+    scan of like_to_user_created_idx and the NOT EXISTS probe of unique_like
+    are index-only.
+    """
+    liked_back = Like.objects.filter(from_user_id=user_id, to_user_id=OuterRef('from_user_id'))
+    likes = Like.objects.filter(to_user_id=user_id).exclude(Exists(liked_back))
+    hidden_users = hidden.hidden_user_ids(user_id)
+    if hidden_users:
+        likes = likes.exclude(from_user_id__in=hidden_users)
+    return likes
+
@@ -0,0 +1,141 @@
+import hashlib
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(r'\.([0-9a-f]{%d})\.[^./]+$' % HASH_LENGTH)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Stores uploads under content-hashed names such as `photo.3f2a9c1b7d4e.jpg`.
+
+    A name then always refers to the same bytes, so it can be cached forever,
+    and uploading identical content twice stores it once.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        root, extension = posixpath.splitext(name)
+        return f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def parse_range(header, size):
+    """(start, end) of a single `bytes=` range, None to send everything, or False if unsatisfiable."""
+    match = RANGE.match(header or '')
+    if match is None:
+        # Absent, malformed or multi-range requests get the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        return (size - length, size - 1) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators, ranges and cache headers.
+
+    Content-hashed names are served as immutable for a year. With
+    MEDIA_SENDFILE set to 'nginx' or 'sendfile' the bytes are handed off to
+    the front proxy through X-Accel-Redirect or X-Sendfile instead.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not fullpath.is_file():
+        raise Http404('Not found')
+
+    stat = fullpath.stat()
+    hashed = HASHED_NAME.search(path)
+    etag = quote_etag(hashed.group(1) if hashed else f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    if hashed:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+    headers = {
+        'ETag': etag,
+        'Cache-Control': cache_control,
+        'Last-Modified': http_date(stat.st_mtime),
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        return HttpResponseNotModified(headers=headers)
+
+    content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile == 'nginx':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path
+        return HttpResponse(content_type=content_type, headers=headers)
+    if sendfile == 'sendfile':
+        headers['X-Sendfile'] = str(fullpath)
+        return HttpResponse(content_type=content_type, headers=headers)
+
+    headers['Accept-Ranges'] = 'bytes'
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range.strip() == etag:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{stat.st_size}'
+        return HttpResponse(status=416, headers=headers)
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read(fullpath, start, end - start + 1), status=206, content_type=content_type, headers=headers
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+        return response
+
+    return FileResponse(fullpath.open('rb'), content_type=content_type, headers=headers)
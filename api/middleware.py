@@ -0,0 +1,91 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import activity, instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityMiddleware:
+    """Buffers authenticated users' activity for the write-behind last_active tracker."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.record(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # The session user is lazy and a flush writes to the database
+        await sync_to_async(self.record)(request)
+        return response
+
+    def record(self, request):
+        # DRF authenticates inside the view and copies the user back onto the request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            activity.touch(user.id)
+
+
+class InstrumentationMiddleware:
+    """
+    Times each request and its SQL queries. Adds a Server-Timing header, logs
+    slow requests and query shapes repeated often enough to suggest an N+1,
+    and feeds the per-view stats of api.instrumentation.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with instrumentation.recording() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with instrumentation.recording() as recorder:
+            response = await self.get_response(request)
+        self.report(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def report(self, request, response, recorder, duration):
+        match = request.resolver_match
+        view = f"{request.method} {match.view_name if match else 'unresolved'}"
+
+        repeated = recorder.repeated(getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE', 5))
+        for sql, count in repeated.items():
+            logger.warning('Possible N+1 in %s: %d queries of %s', view, count, sql)
+        if duration * 1000 >= getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500):
+            logger.warning(
+                'Slow request %s %s: %.1f ms, %d queries in %.1f ms',
+                view, request.path, duration * 1000, recorder.count, recorder.duration * 1000,
+            )
+        instrumentation.record(view, duration, recorder, repeated)
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={duration * 1000:.1f}'
+        )
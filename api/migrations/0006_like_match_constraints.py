@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Min
+
+
+def dedupe_likes_and_matches(apps, schema_editor):
+    Like = apps.get_model('api', 'Like')
+    Match = apps.get_model('api', 'Match')
+
+    # Keep the first like of every (from_user, to_user) pair
+    keep = Like.objects.values('from_user', 'to_user').annotate(first=Min('id')).values('first')
+    Like.objects.exclude(id__in=keep).delete()
+
+    # Store every match as (lower id, higher id), keeping one row per pair
+    Match.objects.filter(user1=F('user2')).delete()
+    for match in Match.objects.filter(user1__gt=F('user2')).only('id', 'user1_id', 'user2_id').iterator():
+        Match.objects.filter(id=match.id).update(user1=match.user2_id, user2=match.user1_id)
+    keep = Match.objects.values('user1', 'user2').annotate(first=Min('id')).values('first')
+    Match.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_likes_and_matches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('from_user', 'to_user'), name='unique_like'),
+        ),
+        migrations.AddConstraint(
+            model_name='match',
+            constraint=models.UniqueConstraint(fields=('user1', 'user2'), name='unique_match'),
+        ),
+        migrations.AddConstraint(
+            model_name='match',
+            constraint=models.CheckConstraint(condition=models.Q(('user1__lt', models.F('user2'))), name='match_canonical_pair'),
+        ),
+    ]
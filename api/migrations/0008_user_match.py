@@ -0,0 +1,69 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_user_matches(apps, schema_editor):
+    Match = apps.get_model('api', 'Match')
+    UserMatch = apps.get_model('api', 'UserMatch')
+
+    batch = []
+    for match in Match.objects.only('id', 'user1_id', 'user2_id', 'created_at').iterator(chunk_size=2000):
+        batch.append(UserMatch(user_id=match.user1_id, other_user_id=match.user2_id, match_id=match.id, created_at=match.created_at))
+        batch.append(UserMatch(user_id=match.user2_id, other_user_id=match.user1_id, match_id=match.id, created_at=match.created_at))
+        if len(batch) >= 2000:
+            UserMatch.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    UserMatch.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_pass'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='match',
+            name='match_user1_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='match',
+            name='match_user2_created_idx',
+        ),
+        migrations.AddField(
+            model_name='usermatch',
+            name='match',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='api.match'),
+        ),
+        migrations.AddField(
+            model_name='usermatch',
+            name='other_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='usermatch',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_matches', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='usermatch',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='usermatch_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usermatch',
+            constraint=models.UniqueConstraint(fields=('user', 'match'), name='unique_user_match'),
+        ),
+        migrations.RunPython(backfill_user_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_user_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:16
+
+from django.db import migrations, models
+
+COMPLETION_FIELDS = ['bio', 'birth_date', 'gender', 'profile_picture', 'location',
+                     'phone_number', 'preferred_gender']
+
+
+def backfill_profile_completion(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+
+    batch = []
+    for profile in Profile.objects.only('id', *COMPLETION_FIELDS).iterator(chunk_size=2000):
+        filled_fields = sum(1 for field in COMPLETION_FIELDS if getattr(profile, field))
+        profile.profile_completion = (filled_fields / len(COMPLETION_FIELDS)) * 100
+        batch.append(profile)
+        if len(batch) >= 2000:
+            Profile.objects.bulk_update(batch, ['profile_completion'])
+            batch = []
+    Profile.objects.bulk_update(batch, ['profile_completion'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_profile_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_completion',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_profile_completion, migrations.RunPython.noop),
+    ]
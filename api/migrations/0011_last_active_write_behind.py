@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_profile_completion_column'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='last_active',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
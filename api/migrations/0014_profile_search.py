@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-18 00:26
+
+from django.db import migrations, models
+
+from api import search
+
+
+def backfill_search_index(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+    search.create_index(schema_editor.connection)
+
+    batch = []
+    for profile in Profile.objects.only('id', 'location', 'user__username').select_related('user').iterator(chunk_size=2000):
+        profile.search_text = search.document(profile.user.username, profile.location)
+        batch.append(profile)
+        if len(batch) >= 2000:
+            Profile.objects.bulk_update(batch, ['search_text'])
+            search.index([(row.pk, row.search_text) for row in batch], schema_editor.connection.alias)
+            batch = []
+    Profile.objects.bulk_update(batch, ['search_text'])
+    search.index([(row.pk, row.search_text) for row in batch], schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_profile_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='search_text',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.3 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+    Like = apps.get_model('api', 'Like')
+    Match = apps.get_model('api', 'Match')
+    UserBlock = apps.get_model('api', 'UserBlock')
+
+    def count(model, field):
+        rows = model.objects.filter(**{field: OuterRef('user_id')}).values(field).annotate(count=Count('pk'))
+        return Coalesce(Subquery(rows.values('count')), 0)
+
+    Profile.objects.using(schema_editor.connection.alias).update(
+        likes_received=count(Like, 'to_user'),
+        likes_given=count(Like, 'from_user'),
+        matches_count=count(Match, 'user1') + count(Match, 'user2'),
+        blocks_received=count(UserBlock, 'blocked'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_profile_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='likes_received',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='likes_given',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='matches_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='blocks_received',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_profile_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='likes_seen_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['to_user', '-created_at', '-id', 'from_user'], name='like_to_user_created_idx'),
+        ),
+    ]
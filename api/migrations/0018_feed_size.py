@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_seen_filter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+from . import geo, search
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -7,7 +10,12 @@ class Profile(models.Model):
     birth_date = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=10, choices=[('M', 'Male'), ('F', 'Female'), ('O', 'Other')])
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    # Resized copies of profile_picture, written by api.images
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     location = models.CharField(max_length=100, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     phone_number = models.CharField(max_length=15, blank=True)
     is_verified = models.BooleanField(default=False)
     preferred_gender = models.CharField(
@@ -18,35 +26,130 @@ class Profile(models.Model):
     min_age_preference = models.IntegerField(default=18)
     max_age_preference = models.IntegerField(default=100)
     max_distance = models.IntegerField(default=50)  # in kilometers
-    last_active = models.DateTimeField(auto_now=True)
+    # Written in bulk by api.activity rather than on every save
+    last_active = models.DateTimeField(default=timezone.now, db_index=True)
     is_premium = models.BooleanField(default=False)
+    # Kept in sync on save so it can be filtered and sorted in SQL
+    profile_completion = models.FloatField(default=0, db_index=True, editable=False)
+    # Bumped on every change so cached representations are never stale
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
+    # Tokens issued with an older version are rejected (see api.authentication)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Normalized username and location tokens, indexed by api.search
+    search_text = models.CharField(max_length=255, blank=True, editable=False)
+    # Engagement counters, only ever changed with F() updates (see api.counters)
+    likes_received = models.PositiveIntegerField(default=0, editable=False)
+    likes_given = models.PositiveIntegerField(default=0, editable=False)
+    matches_count = models.PositiveIntegerField(default=0, editable=False)
+    blocks_received = models.PositiveIntegerField(default=0, editable=False)
+    # Creation time of the newest received like the user has listed
+    likes_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    COMPLETION_FIELDS = ['bio', 'birth_date', 'gender', 'profile_picture', 'location', 
+                         'phone_number', 'preferred_gender']
+    COUNTER_FIELDS = ['likes_received', 'likes_given', 'matches_count', 'blocks_received']
+    # Written with update() by their own code paths, never through save()
+    OUT_OF_BAND_FIELDS = ['token_version', 'likes_seen_at', 'last_active', 'picture_variants']
     
     def __str__(self):
         return f"{self.user.username}'s profile"
     
-    @property
-    def profile_completion(self):
-        fields = ['bio', 'birth_date', 'gender', 'profile_picture', 'location', 
-                 'phone_number', 'preferred_gender']
-        filled_fields = sum(1 for field in fields if getattr(self, field))
-        return (filled_fields / len(fields)) * 100
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        self.profile_completion = self.compute_completion()
+        # Bumped in SQL: other writers bump the row's version meanwhile, and a
+        # version computed from the loaded value may already be cached
+        adding = self._state.adding
+        self.cache_version = self.cache_version + 1 if adding else F('cache_version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'location' in update_fields:
+            self.search_text = search.document(self.user.username, self.location)
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'geohash', 'profile_completion', 'cache_version'}
+            if 'location' in update_fields:
+                kwargs['update_fields'].add('search_text')
+        elif not self._state.adding:
+            # A loaded instance's counters and out-of-band fields may be stale; never write them back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                and field.name not in self.OUT_OF_BAND_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=['cache_version'])
+    
+    def compute_completion(self):
+        filled_fields = sum(1 for field in self.COMPLETION_FIELDS if getattr(self, field))
+        return (filled_fields / len(self.COMPLETION_FIELDS)) * 100
 
 class Match(models.Model):
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user1_matches')
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user2_matches')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Each pair is stored once, with user1 < user2
+        constraints = [
+            models.UniqueConstraint(fields=['user1', 'user2'], name='unique_match'),
+            models.CheckConstraint(condition=models.Q(user1__lt=models.F('user2')), name='match_canonical_pair'),
+        ]
+    
     def __str__(self):
         return f"Match between {self.user1.username} and {self.user2.username}"
 
+class UserMatch(models.Model):
+    """A match as seen by one of its two users; every Match has two."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_matches')
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='participants')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'match'], name='unique_user_match'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='usermatch_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} matched with {self.other_user.username}"
+
 class Like(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes_given')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes_received')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_user', 'to_user'], name='unique_like'),
+        ]
+        indexes = [
+            models.Index(fields=['from_user', '-created_at', '-id'], name='like_from_user_created_idx'),
+            # Inbound likes newest first; from_user makes "who liked me" scans index-only
+            models.Index(fields=['to_user', '-created_at', '-id', 'from_user'], name='like_to_user_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.from_user.username} likes {self.to_user.username}"
 
+class Pass(models.Model):
+    from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='passes_given')
+    to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='passes_received')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_user', 'to_user'], name='unique_pass'),
+        ]
+    
+    def __str__(self):
+        return f"{self.from_user.username} passed on {self.to_user.username}"
+
 class UserBlock(models.Model):
     blocker = models.ForeignKey(User, related_name='blocking', on_delete=models.CASCADE)
     blocked = models.ForeignKey(User, related_name='blocked_by', on_delete=models.CASCADE)
@@ -69,3 +172,33 @@ class Report(models.Model):
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
+
+class Feed(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='feed')
+    built_at = models.DateTimeField(auto_now=True)
+    # Entries stored by the last build; swipes delete them as they go
+    size = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}'s feed"
+
+class FeedEntry(models.Model):
+    feed = models.ForeignKey(Feed, on_delete=models.CASCADE, related_name='entries')
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='feed_entries')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('feed', 'profile')
+        indexes = [
+            models.Index(fields=['feed', '-score', 'profile'], name='feedentry_feed_score_idx'),
+        ]
+
+class SeenFilter(models.Model):
+    """Bloom filter of the users a user has liked or passed (see api.seen)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='seen_filter')
+    bits = models.BinaryField()
+    # Distinct users added, which tells when the filter is full
+    items = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}'s seen filter"
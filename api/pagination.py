@@ -0,0 +1,161 @@
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over a composite, unique ordering.
+
+    The cursor is an opaque encoding of the last row's ordering values, so
+    every page is a single index range scan regardless of its depth. The
+    ordering comes from the queryset when it is already ordered (for example
+    by OrderingFilter), otherwise from `ordering`; `id` is always appended as
+    the tie-breaker. Ordering fields must be non-nullable.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        try:
+            results = list(queryset)
+        except ValidationError:
+            # A cursor value that does not parse for its field
+            raise NotFound(self.invalid_cursor_message)
+        return self.set_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, fetching the page with the async ORM."""
+        queryset = self.page_queryset(queryset, request)
+        try:
+            results = [instance async for instance in queryset]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return self.set_page(results)
+
+    def page_queryset(self, queryset, request):
+        """The queryset of the requested page plus one row to tell whether there is a next page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*self.keys)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(self.ordering)
+        if not any(key.lstrip('-') in ('id', 'pk') for key in ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def after(self, position):
+        """Rows strictly after `position` in the (mixed-direction) key order."""
+        clauses = []
+        for index, key in enumerate(self.keys):
+            field = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            equal = {k.lstrip('-'): v for k, v in zip(self.keys[:index], position[:index])}
+            clauses.append(Q(**equal, **{f'{field}__{lookup}': position[index]}))
+        return reduce(or_, clauses)
+
+    def get_position(self, instance):
+        position = []
+        for key in self.keys:
+            value = instance
+            for attr in key.lstrip('-').split('__'):
+                value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            position = json.loads(data)
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        if not all(isinstance(value, (str, int, float)) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ('-feed_score', 'id')
+
+
+class MatchPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class LikePagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
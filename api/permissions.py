@@ -0,0 +1,15 @@
+from rest_framework.permissions import BasePermission
+
+from .authentication import user_context
+
+
+class IsPremium(BasePermission):
+    """Allows access only to users with a premium profile."""
+    message = 'A premium membership is required.'
+
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return False
+        # Cached alongside the token checks, so this is usually free
+        context = user_context(request.user.id)
+        return bool(context and context['is_premium'])
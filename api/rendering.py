@@ -0,0 +1,175 @@
+"""
+A fast read path for profile and match payloads.
+
+The serializers stay the definition of the API; this module builds the same
+dicts straight from `.values()` rows for the read-heavy endpoints, and
+renders JSON with orjson when it is installed. `api.tests` checks that both
+paths produce identical bytes.
+"""
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from . import caching, images
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name')
+
+# Profile columns read by `profile_data`, besides the user's
+PROFILE_FIELDS = (
+    'id', 'cache_version', 'profile_completion', 'picture_variants', 'bio', 'birth_date', 'gender',
+    'profile_picture', 'location', 'phone_number', 'is_verified', 'preferred_gender',
+    'min_age_preference', 'max_age_preference', 'max_distance', 'last_active', 'is_premium',
+    'likes_received', 'likes_given', 'matches_count',
+)
+
+# Change with every like and match, so they are merged in from the row on
+# every read instead of being cached with the rest of the representation
+COUNTER_FIELDS = ('likes_received', 'likes_given', 'matches_count')
+
+# Formatting is delegated to the serializer fields themselves
+_date = serializers.DateField()
+_datetime = serializers.DateTimeField()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when available, producing the same bytes."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Dates and dataclasses go through DRF's encoder, which formats them differently
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except (orjson.JSONEncodeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def profile_values(prefix='', user_prefix=None):
+    """`.values()` names of the columns `profile_data` reads, for a profile reached through `prefix`."""
+    if user_prefix is None:
+        user_prefix = f'{prefix}user__'
+    return [prefix + field for field in PROFILE_FIELDS] + [user_prefix + field for field in USER_FIELDS]
+
+
+def user_data(row, prefix):
+    return {field: row[prefix + field] for field in USER_FIELDS}
+
+
+def profile_data(row, prefix='', user_prefix=None):
+    """ProfileSerializer's cached representation of the profile in `row`, see `complete`."""
+    if user_prefix is None:
+        user_prefix = f'{prefix}user__'
+    picture = row[f'{prefix}profile_picture']
+    return {
+        'id': row[f'{prefix}id'],
+        'user': user_data(row, user_prefix),
+        'completion_percentage': row[f'{prefix}profile_completion'],
+        'profile_picture_variants': images.variant_urls(row[f'{prefix}picture_variants']),
+        'bio': row[f'{prefix}bio'],
+        'birth_date': _date.to_representation(row[f'{prefix}birth_date']),
+        'gender': row[f'{prefix}gender'],
+        'profile_picture': default_storage.url(picture) if picture else None,
+        'location': row[f'{prefix}location'],
+        'phone_number': row[f'{prefix}phone_number'],
+        'is_verified': row[f'{prefix}is_verified'],
+        'preferred_gender': row[f'{prefix}preferred_gender'],
+        'min_age_preference': row[f'{prefix}min_age_preference'],
+        'max_age_preference': row[f'{prefix}max_age_preference'],
+        'max_distance': row[f'{prefix}max_distance'],
+        'last_active': _datetime.to_representation(row[f'{prefix}last_active']),
+        'is_premium': row[f'{prefix}is_premium'],
+    }
+
+
+def complete(data, counters, request=None):
+    """
+    A cached profile representation with what the cache leaves out: the
+    current `counters`, and URLs made absolute for `request`.
+
+    Cached entries hold relative URLs, since one entry serves requests to any
+    host and callers without a request, and no counters, which would expire
+    the entry on every like.
+    """
+    data = {**data, **counters}
+    if request is None:
+        return data
+    picture = data['profile_picture']
+    return {
+        **data,
+        'profile_picture_variants': {
+            variant: {extension: request.build_absolute_uri(url) for extension, url in urls.items()}
+            for variant, urls in data['profile_picture_variants'].items()
+        },
+        'profile_picture': request.build_absolute_uri(picture) if picture else None,
+    }
+
+
+def profiles_data(rows, request=None, prefix='', user_prefix=None):
+    """`profile_data` of every row, through the same cache as ProfileSerializer."""
+    results = caching.profile_representations(
+        rows,
+        lambda row: profile_data(row, prefix, user_prefix),
+        key=lambda row: caching.cache_key(row[f'{prefix}id'], row[f'{prefix}cache_version']),
+    )
+    return [
+        complete(data, {field: row[prefix + field] for field in COUNTER_FIELDS}, request)
+        for data, row in zip(results, rows)
+    ]
+
+
+def match_values():
+    """`.values()` names of the UserMatch columns `matches_data` reads; the profile's user is the other user."""
+    return ['id', 'match_id', 'created_at'] + profile_values('other_user__profile__', user_prefix='other_user__')
+
+
+def matches_data(rows, request=None):
+    """UserMatchSerializer's representation of UserMatch rows read with `match_values`."""
+    with_profile = [row for row in rows if row['other_user__profile__id'] is not None]
+    profiles = dict(zip(
+        (row['id'] for row in with_profile),
+        profiles_data(with_profile, request, prefix='other_user__profile__', user_prefix='other_user__'),
+    ))
+    return [
+        {
+            'id': row['match_id'],
+            'user': user_data(row, 'other_user__'),
+            'profile': profiles.get(row['id']),
+            'created_at': _datetime.to_representation(row['created_at']),
+        }
+        for row in rows
+    ]
+
+
+def received_like_values():
+    """`.values()` names of the Like columns `received_likes_data` reads."""
+    return ['id', 'created_at'] + profile_values('from_user__profile__', user_prefix='from_user__')
+
+
+def received_likes_data(rows, request=None):
+    """The users behind received Like rows read with `received_like_values`, with their profiles."""
+    with_profile = [row for row in rows if row['from_user__profile__id'] is not None]
+    profiles = dict(zip(
+        (row['id'] for row in with_profile),
+        profiles_data(with_profile, request, prefix='from_user__profile__', user_prefix='from_user__'),
+    ))
+    return [
+        {
+            'id': row['id'],
+            'user': user_data(row, 'from_user__'),
+            'profile': profiles.get(row['id']),
+            'created_at': _datetime.to_representation(row['created_at']),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,67 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# The replica the current block reads from, or None once it has written
+_reads = ContextVar('replica_reads', default=None)
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Read `user_id`'s requests from the primary for REPLICA_PIN_SECONDS, so they see their own writes."""
+    cache.set(pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id), False)
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """
+    Route the reads of this block to a replica from DATABASE_REPLICAS.
+
+    Nothing changes when no replica is configured or `user_id` wrote
+    recently, and the block goes back to the primary after its first write.
+    """
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    if not replicas or (user_id is not None and is_pinned(user_id)):
+        yield
+        return
+    # One replica per block, so its reads see a single point in time
+    token = _reads.set({'alias': random.choice(replicas)})
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+class ReplicaRouter:
+    """Sends reads inside `replica_reads` to a replica and every write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        reads = _reads.get()
+        if reads is not None and reads['alias'] is not None:
+            return reads['alias']
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        reads = _reads.get()
+        if reads is not None:
+            # Read your own writes for the rest of the block
+            reads['alias'] = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,175 @@
+"""
+Vectorized feed ranking.
+
+A block of candidates is loaded as columns, one NumPy array per attribute,
+and scored against a viewer in a single pass; `top_k` then picks the best
+with argpartition instead of sorting the whole block. Either side may hold
+many profiles, so the same code ranks one viewer's candidates (build_feed)
+and one candidate for many viewers (refresh_profile).
+
+Every component lies in [0, 1] and the score is their weighted sum, with
+weights from FEED_SCORE_WEIGHTS. `score_row` is the same formula one pair at
+a time, kept as the reference the vectorized version is checked against.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from . import geo
+
+# Profile columns read by `columns`, in values_list() order
+COLUMNS = (
+    'id', 'user_id', 'birth_date', 'min_age_preference', 'max_age_preference', 'latitude', 'longitude',
+    'max_distance', 'last_active', 'profile_completion', 'is_verified', 'is_premium', 'likes_received',
+    'blocks_received',
+)
+
+DEFAULT_WEIGHTS = {
+    'age_fit': 1.0,      # each one's age near the middle of the other's preferred range
+    'distance': 1.0,     # closeness, relative to the smaller of both maximum distances
+    'recency': 1.0,      # 1 when active now, 1/2 after a day idle
+    'completion': 1.0,
+    'verified': 0.5,
+    'premium': 0.25,
+    'popularity': 0.5,   # likes received, saturating at FEED_POPULAR_LIKES
+    'exposure': 0.25,    # profiles few users liked yet
+    'blocks': -0.5,      # blocks received, saturating at 5
+}
+
+# Component value when a side lacks the birth date or coordinates it needs
+UNKNOWN = 0.5
+DAYS_PER_YEAR = 365.2425
+
+
+def get_weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'FEED_SCORE_WEIGHTS', {})}
+
+
+def popular_likes():
+    return getattr(settings, 'FEED_POPULAR_LIKES', 20)
+
+
+def columns(rows):
+    """Arrays of `rows`, tuples of COLUMNS values as returned by `values_list(*COLUMNS)`."""
+    values = dict(zip(COLUMNS, zip(*rows))) if rows else {name: () for name in COLUMNS}
+
+    def floats(name, convert=float):
+        return np.array([np.nan if value is None else convert(value) for value in values[name]], dtype=float)
+
+    return {
+        'id': np.array(values['id'], dtype=np.int64),
+        'user_id': np.array(values['user_id'], dtype=np.int64),
+        'birth_day': floats('birth_date', lambda day: day.toordinal()),
+        'min_age': floats('min_age_preference'),
+        'max_age': floats('max_age_preference'),
+        'latitude': floats('latitude'),
+        'longitude': floats('longitude'),
+        'max_distance': floats('max_distance'),
+        'last_active': floats('last_active', lambda moment: moment.timestamp()),
+        'completion': floats('profile_completion'),
+        'verified': floats('is_verified'),
+        'premium': floats('is_premium'),
+        'likes': floats('likes_received'),
+        'blocks': floats('blocks_received'),
+    }
+
+
+def profile_columns(profile):
+    """`columns` of a single Profile instance."""
+    return columns([tuple(getattr(profile, name) for name in COLUMNS)])
+
+
+def age_fit(birth_day, min_age, max_age, today):
+    """How close an age is to the middle of a preferred range, 0 at or past its ends."""
+    age = (today - birth_day) / DAYS_PER_YEAR
+    half = (max_age - min_age) / 2
+    fit = np.clip(1 - np.abs(age - (min_age + half)) / (half + 1), 0, 1)
+    return np.where(np.isnan(age), UNKNOWN, fit)
+
+
+def distances_km(lat1, lon1, lat2, lon2):
+    """geo.haversine_km over arrays; NaN where a side has no coordinates."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def score(viewer, candidates, now=None, weights=None):
+    """Scores of `candidates` for `viewer`, both column dicts; a side of length one is broadcast."""
+    now = now or timezone.now()
+    weights = weights or get_weights()
+    today = now.date().toordinal()
+
+    age = (
+        age_fit(candidates['birth_day'], viewer['min_age'], viewer['max_age'], today)
+        + age_fit(viewer['birth_day'], candidates['min_age'], candidates['max_age'], today)
+    ) / 2
+    distance = distances_km(viewer['latitude'], viewer['longitude'], candidates['latitude'], candidates['longitude'])
+    reach = np.minimum(viewer['max_distance'], candidates['max_distance'])
+    closeness = np.where(np.isnan(distance), UNKNOWN, np.clip(1 - distance / np.maximum(reach, 1), 0, 1))
+    hours_idle = np.maximum(now.timestamp() - candidates['last_active'], 0) / 3600
+    likes = candidates['likes']
+
+    components = {
+        'age_fit': age,
+        'distance': closeness,
+        'recency': 1 / (1 + hours_idle / 24),
+        'completion': candidates['completion'] / 100,
+        'verified': candidates['verified'],
+        'premium': candidates['premium'],
+        'popularity': likes / (likes + popular_likes()),
+        'exposure': 1 / (1 + likes),
+        'blocks': np.minimum(candidates['blocks'], 5) / 5,
+    }
+    total = sum(weights[name] * component for name, component in components.items() if weights.get(name))
+    # Components that are all scalars still broadcast to the longer side
+    return np.broadcast_to(total, np.broadcast_shapes(viewer['id'].shape, candidates['id'].shape)).astype(float)
+
+
+def top_k(scores, k):
+    """Indices of the `k` highest scores, best first, without sorting the rest."""
+    if k <= 0 or not len(scores):
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+def score_row(viewer, candidate, now=None, weights=None):
+    """`score` for one viewer and one candidate Profile, in plain Python."""
+    now = now or timezone.now()
+    weights = weights or get_weights()
+    today = now.date().toordinal()
+
+    def fit(profile, other):
+        if profile.birth_date is None:
+            return UNKNOWN
+        age = (today - profile.birth_date.toordinal()) / DAYS_PER_YEAR
+        half = (other.max_age_preference - other.min_age_preference) / 2
+        return min(max(1 - abs(age - (other.min_age_preference + half)) / (half + 1), 0), 1)
+
+    if None in (viewer.latitude, viewer.longitude, candidate.latitude, candidate.longitude):
+        closeness = UNKNOWN
+    else:
+        distance = geo.haversine_km(viewer.latitude, viewer.longitude, candidate.latitude, candidate.longitude)
+        reach = max(min(viewer.max_distance, candidate.max_distance), 1)
+        closeness = min(max(1 - distance / reach, 0), 1)
+    hours_idle = max(now.timestamp() - candidate.last_active.timestamp(), 0) / 3600
+    likes = candidate.likes_received
+
+    components = {
+        'age_fit': (fit(candidate, viewer) + fit(viewer, candidate)) / 2,
+        'distance': closeness,
+        'recency': 1 / (1 + hours_idle / 24),
+        'completion': candidate.profile_completion / 100,
+        'verified': float(candidate.is_verified),
+        'premium': float(candidate.is_premium),
+        'popularity': likes / (likes + popular_likes()),
+        'exposure': 1 / (1 + likes),
+        'blocks': min(candidate.blocks_received, 5) / 5,
+    }
+    return math.fsum(weights[name] * component for name, component in components.items() if weights.get(name))
@@ -0,0 +1,86 @@
+import re
+import unicodedata
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# SQLite keeps an FTS5 index of Profile.search_text in this table, keyed by profile id
+FTS_TABLE = 'api_profile_search'
+# Postgres indexes Profile.search_text with a pg_trgm GIN index of this name
+TRIGRAM_INDEX = 'api_profile_search_text_trgm'
+
+TOKEN = re.compile(r'[^\W_]+')
+
+
+def tokens(text):
+    """Lowercase, accent-free word tokens of `text`."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN.findall(text.casefold())
+
+
+def document(username, location):
+    """The normalized text a profile is searched by."""
+    return ' '.join(tokens(username) + tokens(location))
+
+
+def create_index(connection):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"search_text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON api_profile USING gin (search_text gin_trgm_ops)'
+            )
+
+
+def drop_index(connection):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+def index(rows, using='default'):
+    """Write `(profile_id, search_text)` rows to the FTS table; other databases index the column itself."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, text in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, search_text) VALUES (%s, %s)', rows)
+
+
+def unindex(profile_id, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [profile_id])
+
+
+def search(queryset, query):
+    """
+    Narrow a Profile queryset to profiles matching every token of `query`.
+
+    Tokens match word prefixes through FTS5 on SQLite and substrings through
+    the trigram index on Postgres; both are index lookups.
+    """
+    terms = tokens(query)
+    if not terms:
+        return queryset
+    if connections[queryset.db].vendor == 'sqlite':
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression])
+        )
+    return queryset.filter(reduce(Q.__and__, (Q(search_text__contains=term) for term in terms)))
@@ -0,0 +1,165 @@
+"""
+Per-user Bloom filters of the users someone has already liked or passed.
+
+Building a feed filters candidates against the filter in memory instead of
+anti-joining Like and Pass in SQL. A Bloom filter has no false negatives,
+so its negatives are taken as they are. Its positives are mostly truly seen
+users plus about 1% false ones; only those that would make the feed are
+confirmed against the database, with one bounded lookup.
+
+Filters are updated under a lock on the swiper's profile row, which `like`
+and `swipe_batch` already hold, so concurrent swipes cannot lose each
+other's bits. Removing a like or pass leaves a stale positive, which
+confirmation drops. Likes and passes written without their post_save
+signal, with bulk_create or raw SQL, never reach the filters: call `reset`
+afterwards, as seed_data does, so they are rebuilt.
+"""
+import numpy as np
+from django.db import transaction
+
+from . import scoring
+from .models import Like, Pass, Profile, SeenFilter
+
+# About 1% false positives at capacity
+BITS_PER_ITEM = 10
+HASHES = 7
+MIN_CAPACITY = 1024
+
+
+def mix(values):
+    """splitmix64's finalizer; uint64 arithmetic wraps."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class BloomFilter:
+    """A Bloom filter of integer ids, with numpy doing every id of a batch at once."""
+
+    def __init__(self, capacity, bits=None, items=0):
+        self.capacity = max(capacity, MIN_CAPACITY)
+        size = self.capacity * BITS_PER_ITEM // 8
+        self.bits = np.zeros(size, dtype=np.uint8) if bits is None else np.frombuffer(bits, dtype=np.uint8).copy()
+        self.items = items
+
+    @classmethod
+    def from_bytes(cls, bits, items):
+        return cls(len(bits) * 8 // BITS_PER_ITEM, bytes(bits), items)
+
+    @classmethod
+    def of(cls, ids):
+        """A filter holding `ids` with room for as many again."""
+        bloom = cls(2 * len(ids))
+        bloom.add(ids)
+        return bloom
+
+    @property
+    def full(self):
+        return self.items > self.capacity
+
+    def positions(self, ids):
+        # Double hashing: position i of an id is h1 + i * h2
+        ids = np.asarray(ids, dtype=np.uint64).reshape(-1)
+        first = mix(ids)
+        second = mix(ids ^ np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        steps = np.arange(HASHES, dtype=np.uint64)
+        return (first[:, None] + steps * second[:, None]) % np.uint64(len(self.bits) * 8)
+
+    def add(self, ids):
+        # Only ids not in yet count towards capacity
+        ids = np.unique(np.asarray(ids, dtype=np.uint64))
+        ids = ids[~self.contains(ids)]
+        positions = self.positions(ids)
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.items += len(ids)
+
+    def contains(self, ids):
+        """Mask of the `ids` that may be in the filter; False is certain."""
+        positions = self.positions(ids)
+        return ((self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1).all(axis=1)
+
+    def to_bytes(self):
+        return self.bits.tobytes()
+
+
+def seen_user_ids(user_id, among=None):
+    """Exactly the users `user_id` liked or passed, optionally only those `among` the given ids."""
+    seen = set()
+    for model in (Like, Pass):
+        rows = model.objects.filter(from_user_id=user_id)
+        if among is not None:
+            rows = rows.filter(to_user_id__in=among)
+        seen.update(rows.values_list('to_user_id', flat=True))
+    return seen
+
+
+def load(user_id):
+    """`user_id`'s filter, built from the database the first time."""
+    row = SeenFilter.objects.filter(user_id=user_id).values_list('bits', 'items').first()
+    if row is not None:
+        return BloomFilter.from_bytes(*row)
+    with transaction.atomic():
+        # The swipe paths' lock, so no like slips in between reading and storing
+        list(Profile.objects.select_for_update().filter(user_id=user_id).values_list('id'))
+        row = SeenFilter.objects.filter(user_id=user_id).values_list('bits', 'items').first()
+        if row is not None:
+            return BloomFilter.from_bytes(*row)
+        bloom = BloomFilter.of(list(seen_user_ids(user_id)))
+        SeenFilter.objects.create(user_id=user_id, bits=bloom.to_bytes(), items=bloom.items)
+    return bloom
+
+
+def add(user_id, user_ids):
+    """Record that `user_id` liked or passed `user_ids`."""
+    if not user_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        # The lock `load` builds under, taken while reading the filter
+        row = (
+            Profile.objects.select_for_update(of=('self',))
+            .filter(user_id=user_id)
+            .values_list('user__seen_filter__bits', 'user__seen_filter__items')
+            .first()
+        )
+        if row is None or row[0] is None:
+            # Built from the database, new rows included, when first needed
+            return
+        bloom = BloomFilter.from_bytes(*row)
+        bloom.add(list(user_ids))
+        if bloom.full:
+            # Rebuilt exactly, with room to grow, rather than let false positives climb
+            bloom = BloomFilter.of(list(seen_user_ids(user_id)))
+        SeenFilter.objects.filter(user_id=user_id).update(bits=bloom.to_bytes(), items=bloom.items)
+
+
+def reset(user_ids=None):
+    """Drop the filters of `user_ids`, or everyone's, so they are rebuilt from the database."""
+    filters = SeenFilter.objects.all()
+    if user_ids is not None:
+        filters = filters.filter(user_id__in=user_ids)
+    filters.delete()
+
+
+def best_unseen(user_id, user_ids, scores, k, bloom=None):
+    """
+    Indices of the `k` best `scores` whose `user_ids` `user_id` has neither
+    liked nor passed, best first.
+
+    Only the best k plus the filter's positives are ranked, which always
+    holds k negatives when there are that many. Positives ranked below the
+    k-th negative cannot make the cut and are never looked up. Of the others
+    at most k, the best, are confirmed, so the lookup stays bounded however
+    much the user has swiped; positives past them are taken as seen.
+    """
+    bloom = bloom or load(user_id)
+    maybe = bloom.contains(user_ids)
+    order = scoring.top_k(scores, k + int(maybe.sum()))
+    ranked = user_ids[order]
+    maybe = maybe[order]
+    negatives = np.flatnonzero(~maybe)
+    cutoff = negatives[k - 1] if len(negatives) >= k else len(ranked)
+    contenders = np.flatnonzero(maybe[:cutoff])[:k]
+    if len(contenders):
+        confirmed = seen_user_ids(user_id, ranked[contenders].tolist())
+        maybe[contenders] = np.isin(ranked[contenders], list(confirmed))
+    return order[~maybe][:k]
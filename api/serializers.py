@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile, Match, Like, Report
+from django.db import models
+from .models import Profile, Match, UserMatch, Like, Report
+from . import caching, images, rendering
+from .authentication import TOKEN_VERSION_CLAIM
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.password_validation import validate_password
 
@@ -9,17 +12,51 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
 
+class ProfileListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        profiles = data.all() if isinstance(data, models.manager.BaseManager) else data
+        profiles = list(profiles)
+        request = self.context.get('request')
+        return [
+            rendering.complete(data, self.child.counters(profile), request)
+            for data, profile in zip(caching.profile_representations(profiles, self.child.serialize), profiles)
+        ]
+
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    completion_percentage = serializers.SerializerMethodField()
+    completion_percentage = serializers.FloatField(source='profile_completion', read_only=True)
+    profile_picture_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Profile
-        fields = '__all__'
+        list_serializer_class = ProfileListSerializer
+        # Blocks feed ranking, but nobody is told how often they were blocked
+        exclude = ('geohash', 'picture_variants', 'profile_completion', 'cache_version', 'token_version',
+                   'search_text', 'blocks_received', 'likes_seen_at')
         read_only_fields = ('user', 'is_verified', 'is_premium')
+        # Exact coordinates are never shown to other users
+        extra_kwargs = {
+            'latitude': {'write_only': True, 'min_value': -90, 'max_value': 90},
+            'longitude': {'write_only': True, 'min_value': -180, 'max_value': 180},
+        }
+    
+    def to_representation(self, instance):
+        data = caching.profile_representations([instance], self.serialize)[0]
+        return rendering.complete(data, self.counters(instance), self.context.get('request'))
+    
+    def serialize(self, instance):
+        data = super().to_representation(instance)
+        # What rendering.complete adds back to the cached copy
+        data['profile_picture'] = instance.profile_picture.url if instance.profile_picture else None
+        for field in rendering.COUNTER_FIELDS:
+            del data[field]
+        return data
+    
+    def counters(self, instance):
+        return {field: getattr(instance, field) for field in rendering.COUNTER_FIELDS}
     
-    def get_completion_percentage(self, obj):
-        return obj.profile_completion
+    def get_profile_picture_variants(self, obj):
+        return images.variant_urls(obj.picture_variants)
 
 class MatchSerializer(serializers.ModelSerializer):
     user1 = UserSerializer(read_only=True)
@@ -29,6 +66,15 @@ class MatchSerializer(serializers.ModelSerializer):
         model = Match
         fields = '__all__'
 
+class UserMatchSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='match_id', read_only=True)
+    user = UserSerializer(source='other_user', read_only=True)
+    profile = ProfileSerializer(source='other_user.profile', read_only=True)
+    
+    class Meta:
+        model = UserMatch
+        fields = ('id', 'user', 'profile', 'created_at')
+
 class LikeSerializer(serializers.ModelSerializer):
     from_user = UserSerializer(read_only=True)
     to_user = UserSerializer(read_only=True)
@@ -42,10 +88,20 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
         token['username'] = user.username
+        # Checked by CachedJWTAuthentication, so revoke_tokens can reject this token later
+        token_version = Profile.objects.filter(user=user).values_list('token_version', flat=True).first()
+        token[TOKEN_VERSION_CLAIM] = token_version or 0
         return token
 
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
-        read_only_fields = ('reporter', 'is_resolved') 
\ No newline at end of file
+        read_only_fields = ('reporter', 'is_resolved')
+
+class SwipeSerializer(serializers.Serializer):
+    profile_id = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=['like', 'pass'])
+
+class SwipeBatchSerializer(serializers.Serializer):
+    swipes = SwipeSerializer(many=True, allow_empty=False, max_length=500)
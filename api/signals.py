@@ -0,0 +1,150 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import authentication, counters, events, feed, hidden, images, instrumentation, matching, routers, search, seen
+from .models import Like, Match, Pass, Profile, Report, UserBlock
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
+
+
+@receiver(post_save, sender=Profile)
+def refresh_feeds_on_profile_save(sender, instance, **kwargs):
+    feed.refresh_profile_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def process_new_profile_picture(sender, instance, **kwargs):
+    picture = instance.profile_picture.name
+    if picture and instance.picture_variants.get('source') != picture:
+        images.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_search_text(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or 'search_text' in update_fields:
+        search.index([(instance.pk, instance.search_text)], using)
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile_search_text(sender, instance, using, **kwargs):
+    search.unindex(instance.pk, using)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user(sender, instance, **kwargs):
+    # Runs while the user's likes, matches and blocks still exist
+    counters.adjust(counters.user_deleted(instance.id))
+
+
+@receiver(pre_save, sender=User)
+def refuse_token_claims_user(sender, instance, **kwargs):
+    if getattr(instance, 'from_token_claims', False):
+        raise RuntimeError('Users built from token claims are read-only; load the User to change it')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_auth_context(sender, instance, **kwargs):
+    authentication.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def expire_auth_context_of_profile(sender, instance, **kwargs):
+    authentication.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def expire_cached_profile(sender, instance, created, update_fields=None, **kwargs):
+    # The profile representation embeds the user, but not its last_login
+    if not created and update_fields != {'last_login'}:
+        Profile.objects.filter(user=instance).update(cache_version=F('cache_version') + 1)
+
+
+@receiver(post_save, sender=User)
+def reindex_renamed_user(sender, instance, created, using, update_fields=None, **kwargs):
+    # Profile.search_text embeds the username
+    if created or update_fields == {'last_login'}:
+        return
+    rows = []
+    for pk, location, search_text in Profile.objects.filter(user=instance).values_list('id', 'location', 'search_text'):
+        text = search.document(instance.username, location)
+        if text != search_text:
+            Profile.objects.filter(pk=pk).update(search_text=text)
+            rows.append((pk, text))
+    search.index(rows, using)
+
+
+@receiver(post_save, sender=Like)
+def discard_liked_profile(sender, instance, created, **kwargs):
+    routers.pin_to_primary(instance.from_user_id)
+    if created:
+        counters.adjust(counters.liked(instance.from_user_id, [instance.to_user_id]))
+        seen.add(instance.from_user_id, [instance.to_user_id])
+        feed.discard(instance.from_user_id, [instance.to_user_id])
+        events.like_created(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_save, sender=Pass)
+def record_passed_profile(sender, instance, created, **kwargs):
+    # swipe_batch bulk creates its passes and records them itself; this covers
+    # single rows, e.g. from the admin, which hold no lock (seen.add takes it)
+    if created:
+        seen.add(instance.from_user_id, [instance.to_user_id])
+        feed.discard(instance.from_user_id, [instance.to_user_id])
+
+
+@receiver(post_delete, sender=Like)
+def uncount_like(sender, instance, origin=None, **kwargs):
+    if not counters.deleting_user(origin):
+        counters.adjust(counters.liked(instance.from_user_id, [instance.to_user_id], -1))
+
+
+@receiver(post_save, sender=UserBlock)
+def hide_blocked_users(sender, instance, created, **kwargs):
+    routers.pin_to_primary(instance.blocker_id)
+    hidden.invalidate(instance.blocker_id, instance.blocked_id)
+    if created:
+        counters.adjust([(instance.blocked_id, 'blocks_received', 1)])
+        feed.discard(instance.blocker_id, [instance.blocked_id])
+        feed.discard(instance.blocked_id, [instance.blocker_id])
+
+
+@receiver(post_delete, sender=UserBlock)
+def unhide_blocked_users(sender, instance, origin=None, **kwargs):
+    hidden.invalidate(instance.blocker_id, instance.blocked_id)
+    if not counters.deleting_user(origin):
+        counters.adjust([(instance.blocked_id, 'blocks_received', -1)])
+
+
+@receiver(post_save, sender=Report)
+def hide_reported_user(sender, instance, created, **kwargs):
+    routers.pin_to_primary(instance.reporter_id)
+    hidden.invalidate(instance.reporter_id)
+    if created:
+        feed.discard(instance.reporter_id, [instance.reported_id])
+
+
+@receiver(post_delete, sender=Report)
+def unhide_reported_user(sender, instance, **kwargs):
+    hidden.invalidate(instance.reporter_id)
+
+
+@receiver(post_save, sender=Match)
+def record_match_participants(sender, instance, created, **kwargs):
+    if created:
+        matching.record_matches([instance])
+        counters.adjust(counters.matched([instance]))
+        events.match_created(instance)
+
+
+@receiver(post_delete, sender=Match)
+def uncount_match(sender, instance, origin=None, **kwargs):
+    if not counters.deleting_user(origin):
+        counters.adjust(counters.matched([instance], -1))
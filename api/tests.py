@@ -1,17 +1,47 @@
-from django.test import TestCase
+from django.test import AsyncClient, override_settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from asgiref.sync import sync_to_async
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
+from rest_framework.renderers import JSONRenderer
+from unittest import mock
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Profile, Like, Match, UserBlock, Report
-from .serializers import ProfileSerializer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import Profile, Like, Match, Pass, UserBlock, UserMatch, Report, Feed, FeedEntry, SeenFilter
+from .serializers import ProfileSerializer, UserMatchSerializer
+import asyncio
+import io
+import json
+import os
 import logging
-from datetime import date
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from django.utils import timezone
+from .feed import years_before
+from . import activity, authentication, caching, events, feed, hidden, instrumentation, matching, rendering, routers, scoring, search, seen
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+def birth_date_for_age(age):
+    return years_before(date.today(), age)
+
 class ShiputyAPITests(APITestCase):
+    # The replica's test database stays empty, like a replica that has not caught up
+    databases = {'default', 'replica'}
+    
     def setUp(self):
         # Create test users
         self.user1 = User.objects.create_user(
@@ -34,7 +64,7 @@ class ShiputyAPITests(APITestCase):
         self.profile1 = Profile.objects.create(
             user=self.user1,
             bio="Test bio 1",
-            birth_date=date(1990, 1, 1),
+            birth_date=birth_date_for_age(29),
             gender='M',
             location='City 1',
             preferred_gender='F',
@@ -47,7 +77,7 @@ class ShiputyAPITests(APITestCase):
         self.profile2 = Profile.objects.create(
             user=self.user2,
             bio="Test bio 2",
-            birth_date=date(1995, 1, 1),
+            birth_date=birth_date_for_age(26),
             gender='F',
             location='City 2',
             preferred_gender='M',
@@ -59,7 +89,7 @@ class ShiputyAPITests(APITestCase):
         self.profile3 = Profile.objects.create(
             user=self.user3,
             bio="Test bio 3",
-            birth_date=date(1992, 1, 1),
+            birth_date=birth_date_for_age(28),
             gender='M',
             location='City 3',
             preferred_gender='A',
@@ -69,6 +99,12 @@ class ShiputyAPITests(APITestCase):
             phone_number='+1234567892'
         )
         
+        # Cached state must not leak between tests
+        cache.clear()
+        activity.reset()
+        self.addCleanup(activity.reset)
+        instrumentation.reset()
+        
         # Set up the API client
         self.client = APIClient()
         logger.info('Test setup completed')
@@ -160,7 +196,7 @@ class ShiputyAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # User1 prefers females, so should only see profile2
-        profiles = [profile['id'] for profile in response.data]
+        profiles = [profile['id'] for profile in response.data['results']]
         self.assertIn(self.profile2.id, profiles)
         self.assertNotIn(self.profile3.id, profiles)
         logger.info('Preference-based filtering test completed')
@@ -175,7 +211,7 @@ class ShiputyAPITests(APITestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        profiles = [profile['id'] for profile in response.data]
+        profiles = [profile['id'] for profile in response.data['results']]
         self.assertNotIn(self.profile2.id, profiles)
         logger.info('Blocked users filtering test completed')
 
@@ -186,7 +222,7 @@ class ShiputyAPITests(APITestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertNotIn(self.profile1.id, [profile['id'] for profile in response.data])
+        self.assertNotIn(self.profile1.id, [profile['id'] for profile in response.data['results']])
         logger.info('Authenticated profile access test completed')
     
     def test_like_profile(self):
@@ -219,8 +255,1142 @@ class ShiputyAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['detail'], "It's a match!")
         
+        # Matches are stored as a canonical (lower id, higher id) pair
         self.assertTrue(Match.objects.filter(
-            user1=self.user2,
-            user2=self.user1
+            user1=self.user1,
+            user2=self.user2
         ).exists())
         logger.info('Match creation test completed')
+
+    def test_feed_mutual_preferences(self):
+        """Test that the feed only contains profiles that would accept the viewer"""
+        self.client.force_authenticate(user=self.user3)
+        url = reverse('api:profile-list')
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # User3 accepts everyone, but profile1 only wants females
+        profiles = [profile['id'] for profile in response.data['results']]
+        self.assertIn(self.profile2.id, profiles)
+        self.assertNotIn(self.profile1.id, profiles)
+        logger.info('Feed mutual preferences test completed')
+
+    def test_feed_age_preferences(self):
+        """Test that profiles outside the age range leave an existing feed"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        self.client.get(url)
+        self.assertTrue(FeedEntry.objects.filter(feed__user=self.user1, profile=self.profile2).exists())
+        
+        self.profile2.birth_date = birth_date_for_age(40)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile2.save()
+        
+        response = self.client.get(url)
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        logger.info('Feed age preferences test completed')
+
+    def test_feed_excludes_liked_profiles(self):
+        """Test that liked profiles are dropped from the stored feed"""
+        self.client.force_authenticate(user=self.user1)
+        self.client.get(reverse('api:profile-list'))
+        self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile2.id}))
+        
+        self.assertFalse(FeedEntry.objects.filter(feed__user=self.user1, profile=self.profile2).exists())
+        Feed.objects.all().delete()
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        logger.info('Feed liked profiles test completed')
+
+    def test_feed_incremental_refresh(self):
+        """Test that a new compatible profile is added to existing feeds"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        self.client.get(url)
+        
+        user4 = User.objects.create_user(username='user4', password='testpass123')
+        # Feeds are refreshed once the save commits
+        with self.captureOnCommitCallbacks(execute=True):
+            profile4 = Profile.objects.create(
+                user=user4,
+                birth_date=birth_date_for_age(25),
+                gender='F',
+                preferred_gender='A'
+            )
+        
+        response = self.client.get(url)
+        self.assertIn(profile4.id, [profile['id'] for profile in response.data['results']])
+        
+        # Only the FEED_REFRESH_LIMIT most recently active viewers get it right away
+        with mock.patch('api.feed.FEED_REFRESH_LIMIT', 0), self.captureOnCommitCallbacks(execute=True):
+            profile4.save()
+        self.assertFalse(FeedEntry.objects.filter(profile=profile4).exists())
+        logger.info('Feed incremental refresh test completed')
+
+    def test_feed_refilled_when_swiped_through(self):
+        """Test that a feed swiped below its low-water mark is rebuilt before its TTL"""
+        profiles = [
+            Profile.objects.create(
+                user=User.objects.create(username=f'candidate{number}'),
+                birth_date=birth_date_for_age(25), gender='F', preferred_gender='M',
+            )
+            for number in range(4)
+        ]
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        with mock.patch('api.feed.FEED_SIZE', 2), mock.patch('api.feed.FEED_LOW_WATER', 1):
+            shown = [profile['id'] for profile in self.client.get(url).data['results']]
+            self.assertEqual(len(shown), 2)
+            for profile_id in shown:
+                self.client.post(reverse('api:like-profile', kwargs={'profile_id': profile_id}))
+            response = self.client.get(url)
+        remaining = {profile.id for profile in profiles} | {self.profile2.id}
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertTrue({profile['id'] for profile in response.data['results']} <= remaining - set(shown))
+        logger.info('Feed refill test completed')
+
+    def test_geohash_maintained_on_save(self):
+        """Test that coordinates are indexed as a geohash"""
+        self.profile1.latitude = 41.0082
+        self.profile1.longitude = 28.9784
+        self.profile1.save()
+        self.assertEqual(self.profile1.geohash[:6], 'sxk973')
+        
+        self.profile1.latitude = None
+        self.profile1.save()
+        self.assertEqual(self.profile1.geohash, '')
+        logger.info('Geohash test completed')
+
+    def test_radius_filter(self):
+        """Test filtering profiles within a radius of the caller"""
+        # Istanbul, a suburb 20 km away and Ankara ~350 km away
+        Profile.objects.filter(pk=self.profile1.pk).update(latitude=41.0082, longitude=28.9784)
+        self.profile2.latitude, self.profile2.longitude = 41.1, 29.15
+        self.profile2.save()
+        user4 = User.objects.create_user(username='user4', password='testpass123')
+        profile4 = Profile.objects.create(
+            user=user4, gender='F', preferred_gender='A', max_distance=500,
+            latitude=39.9334, longitude=32.8597
+        )
+        
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        response = self.client.get(url, {'within_km': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profiles = [profile['id'] for profile in response.data['results']]
+        self.assertIn(self.profile2.id, profiles)
+        self.assertNotIn(profile4.id, profiles)
+        
+        response = self.client.get(url, {'within_km': 30, 'lat': 39.9, 'lon': 32.85})
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        
+        response = self.client.get(url, {'within_km': 'far'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        logger.info('Radius filter test completed')
+
+    def test_feed_distance_preferences(self):
+        """Test that the feed respects max_distance on both sides"""
+        self.profile1.latitude, self.profile1.longitude = 41.0082, 28.9784
+        self.profile1.max_distance = 500
+        self.profile1.save()
+        # Ankara is within profile1's range but beyond profile2's 30 km
+        self.profile2.latitude, self.profile2.longitude = 39.9334, 32.8597
+        self.profile2.save()
+        
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        
+        self.profile2.max_distance = 400
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile2.save()
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        logger.info('Feed distance preferences test completed')
+
+    def test_feed_keyset_pagination(self):
+        """Test walking the feed page by page with opaque cursors"""
+        extra = []
+        for i in range(5):
+            user = User.objects.create_user(username=f'extra{i}', password='testpass123')
+            extra.append(Profile.objects.create(
+                user=user, birth_date=birth_date_for_age(25), gender='F', preferred_gender='M'
+            ).id)
+        
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [profile['id'] for profile in response.data['results']]
+            url = response.data['next']
+        
+        self.assertEqual(sorted(seen), sorted(extra + [self.profile2.id]))
+        
+        response = self.client.get(reverse('api:profile-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        logger.info('Feed keyset pagination test completed')
+
+    def test_matches_and_likes_pagination(self):
+        """Test that matches and likes are paginated newest first"""
+        Match.objects.create(user1=self.user1, user2=self.user2)
+        Match.objects.create(user1=self.user1, user2=self.user3)
+        Like.objects.create(from_user=self.user1, to_user=self.user2)
+        
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:matches'), {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['user']['id'], self.user3.id)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['user']['id'], self.user2.id)
+        self.assertIsNone(response.data['next'])
+        
+        response = self.client.get(reverse('api:likes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        logger.info('Matches and likes pagination test completed')
+
+    def test_duplicate_like(self):
+        """Test that liking twice keeps a single like"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:like-profile', kwargs={'profile_id': self.profile2.id})
+        self.client.post(url)
+        response = self.client.post(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Already liked')
+        self.assertEqual(Like.objects.filter(from_user=self.user1, to_user=self.user2).count(), 1)
+        
+        # A like committed by a concurrent request is caught by the insert itself
+        Like.objects.bulk_create([Like(from_user=self.user1, to_user=self.user3)])
+        response = self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile3.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Profile.objects.get(pk=self.profile3.pk).likes_received, 0)
+        logger.info('Duplicate like test completed')
+
+    def test_like_constraints(self):
+        """Test that the database rejects duplicate likes and non-canonical matches"""
+        Like.objects.create(from_user=self.user1, to_user=self.user2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Like.objects.create(from_user=self.user1, to_user=self.user2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Match.objects.create(user1=self.user2, user2=self.user1)
+        logger.info('Like constraints test completed')
+
+    def test_like_own_profile_and_missing_profile(self):
+        """Test liking your own or a non-existent profile"""
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile1.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('api:like-profile', kwargs={'profile_id': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        logger.info('Own and missing profile like test completed')
+
+    def test_swipe_batch(self):
+        """Test applying a batch of likes and passes in one request"""
+        Like.objects.create(from_user=self.user2, to_user=self.user1)
+        Like.objects.create(from_user=self.user1, to_user=self.user3)
+        
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:swipe-batch')
+        response = self.client.post(url, {'swipes': [
+            {'profile_id': self.profile2.id, 'action': 'like'},
+            {'profile_id': self.profile3.id, 'action': 'like'},
+            {'profile_id': self.profile3.id, 'action': 'pass'},
+            {'profile_id': self.profile1.id, 'action': 'like'},
+            {'profile_id': 999999, 'action': 'like'},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['result'] for item in response.data['results']],
+            ['matched', 'already_liked', 'passed', 'own_profile', 'not_found']
+        )
+        self.assertTrue(Match.objects.filter(user1=self.user1, user2=self.user2).exists())
+        self.assertTrue(Pass.objects.filter(from_user=self.user1, to_user=self.user3).exists())
+        
+        # Replaying the same batch is harmless
+        response = self.client.post(url, {'swipes': [
+            {'profile_id': self.profile2.id, 'action': 'like'},
+        ]}, format='json')
+        self.assertEqual(response.data['results'][0]['result'], 'already_liked')
+        self.assertEqual(Match.objects.count(), 1)
+        logger.info('Swipe batch test completed')
+
+    def test_swipe_batch_query_count(self):
+        """Test that the batch query count does not depend on its size"""
+        users = User.objects.bulk_create([User(username=f'swipe{i}') for i in range(20)])
+        profiles = Profile.objects.bulk_create([Profile(user=user, gender='F') for user in users])
+        Like.objects.bulk_create([Like(from_user=user, to_user=self.user1) for user in users[:10]])
+        swipes = [{'profile_id': profile.id, 'action': 'like'} for profile in profiles]
+        
+        self.client.force_authenticate(user=self.user1)
+        hidden.hidden_user_ids(self.user1.id)
+        with self.assertNumQueries(11):
+            self.client.post(reverse('api:swipe-batch'), {'swipes': swipes}, format='json')
+        self.assertEqual(Match.objects.filter(user1=self.user1).count(), 10)
+        logger.info('Swipe batch query count test completed')
+
+    def test_swipe_batch_validation(self):
+        """Test that malformed batches are rejected"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:swipe-batch')
+        response = self.client.post(url, {'swipes': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'swipes': [{'profile_id': 1, 'action': 'superlike'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        logger.info('Swipe batch validation test completed')
+
+    def test_matches_show_other_user(self):
+        """Test that each match lists the other user's profile"""
+        Match.objects.create(user1=self.user1, user2=self.user2)
+        
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.get(reverse('api:matches'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        match = response.data['results'][0]
+        self.assertEqual(match['user']['id'], self.user1.id)
+        self.assertEqual(match['profile']['id'], self.profile1.id)
+        logger.info('Matches other user test completed')
+
+    def test_matches_query_count(self):
+        """Test that listing matches costs the same for one or many matches"""
+        Match.objects.create(user1=self.user1, user2=self.user2)
+        self.client.force_authenticate(user=self.user1)
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('api:matches'))
+        
+        users = User.objects.bulk_create([User(username=f'match{i}') for i in range(10)])
+        Profile.objects.bulk_create([Profile(user=user, gender='F') for user in users])
+        for user in users:
+            Match.objects.create(user1=self.user1, user2=user)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('api:matches'))
+        
+        self.assertEqual(len(response.data['results']), 11)
+        self.assertEqual(len(single), len(many))
+        logger.info('Matches query count test completed')
+
+    def test_blocked_by_users_filtering(self):
+        """Test that users who blocked the caller are hidden from them"""
+        self.client.force_authenticate(user=self.user2)
+        UserBlock.objects.create(blocker=self.user2, blocked=self.user1)
+        
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        response = self.client.get(reverse('api:profile-detail', kwargs={'pk': self.profile2.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile2.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        logger.info('Blocked-by users filtering test completed')
+
+    def test_reported_users_filtering(self):
+        """Test that reported users disappear from the reporter's feed"""
+        self.client.force_authenticate(user=self.user1)
+        self.client.post(
+            reverse('api:profile-report', kwargs={'pk': self.profile2.id}),
+            {'reason': 'SPAM', 'description': 'Spam', 'reported': self.user2.id},
+            format='json'
+        )
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertNotIn(self.profile2.id, [profile['id'] for profile in response.data['results']])
+        logger.info('Reported users filtering test completed')
+
+    def test_hidden_set_cache(self):
+        """Test that the hidden set is cached and invalidated by signals"""
+        block = UserBlock.objects.create(blocker=self.user1, blocked=self.user2)
+        self.assertEqual(hidden.hidden_user_ids(self.user2.id), {self.user1.id})
+        with self.assertNumQueries(0):
+            hidden.hidden_user_ids(self.user2.id)
+        
+        block.delete()
+        self.assertEqual(hidden.hidden_user_ids(self.user1.id), set())
+        self.assertEqual(hidden.hidden_user_ids(self.user2.id), set())
+        
+        # A replica that has not seen the block yet must not end up in the cache
+        UserBlock.objects.create(blocker=self.user1, blocked=self.user3)
+        with override_settings(DATABASE_REPLICAS=['replica']), routers.replica_reads(self.user3.id):
+            self.assertEqual(hidden.hidden_user_ids(self.user3.id), {self.user1.id})
+        logger.info('Hidden set cache test completed')
+
+    def test_profile_cache_versioning(self):
+        """Test that cached profiles are served until the profile or user changes"""
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-detail', kwargs={'pk': self.profile2.id})
+        self.client.get(url)
+        stats = caching.profile_cache_stats()
+        self.client.get(url)
+        self.assertEqual(caching.profile_cache_stats()['hits'], stats['hits'] + 1)
+        
+        self.profile2.bio = 'Updated bio'
+        self.profile2.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['bio'], 'Updated bio')
+        
+        # The row's version moves on under a loaded instance, which must not reuse a cached one
+        profile = Profile.objects.get(pk=self.profile2.pk)
+        Profile.objects.filter(pk=profile.pk).update(cache_version=F('cache_version') + 1)
+        self.client.get(url)
+        profile.bio = 'Edited again'
+        profile.save()
+        self.assertEqual(profile.cache_version, Profile.objects.get(pk=profile.pk).cache_version)
+        response = self.client.get(url)
+        self.assertEqual(response.data['bio'], 'Edited again')
+        
+        self.user2.first_name = 'Renamed'
+        self.user2.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['user']['first_name'], 'Renamed')
+        logger.info('Profile cache versioning test completed')
+
+    def test_profile_cache_bulk_lookup(self):
+        """Test that a feed page needs a single cache lookup"""
+        self.client.force_authenticate(user=self.user3)
+        url = reverse('api:profile-list')
+        self.client.get(url)
+        stats = caching.profile_cache_stats()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        after = caching.profile_cache_stats()
+        self.assertEqual(after['hits'] - stats['hits'], len(response.data['results']))
+        self.assertEqual(after['misses'], stats['misses'])
+        logger.info('Profile cache bulk lookup test completed')
+
+    def test_cache_stats_admin_only(self):
+        """Test that cache statistics are only visible to staff"""
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse('api:cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', response.data['profile_cache'])
+        logger.info('Cache stats test completed')
+
+    def test_profile_completion_column(self):
+        """Test that completion is stored on save and usable in filters and ordering"""
+        self.assertAlmostEqual(self.profile2.profile_completion, 6 / 7 * 100)
+        user4 = User.objects.create_user(username='user4', password='testpass123')
+        sparse = Profile.objects.create(user=user4, gender='F', preferred_gender='A')
+        self.assertAlmostEqual(Profile.objects.get(pk=sparse.pk).profile_completion, 2 / 7 * 100)
+        
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        response = self.client.get(url, {'profile_completion__gte': 40})
+        profiles = [profile['id'] for profile in response.data['results']]
+        self.assertIn(self.profile2.id, profiles)
+        self.assertNotIn(sparse.id, profiles)
+        
+        response = self.client.get(url, {'ordering': 'profile_completion', 'page_size': 1})
+        self.assertEqual(response.data['results'][0]['id'], sparse.id)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['id'], self.profile2.id)
+        logger.info('Profile completion column test completed')
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=timedelta(hours=1))
+    def test_activity_write_behind(self):
+        """Test that activity is buffered, throttled and written in bulk"""
+        before = Profile.objects.get(pk=self.profile1.pk).last_active
+        self.client.force_authenticate(user=self.user1)
+        self.client.get(reverse('api:matches'))
+        self.client.get(reverse('api:matches'))
+        activity.touch(self.user2.id)
+        
+        # Nothing is written until the buffer is flushed, and user1 is buffered once
+        self.assertEqual(Profile.objects.get(pk=self.profile1.pk).last_active, before)
+        self.assertEqual(activity.flush(), 2)
+        self.assertGreater(Profile.objects.get(pk=self.profile1.pk).last_active, before)
+        self.assertGreater(Profile.objects.get(pk=self.profile2.pk).last_active, before)
+        
+        # Still throttled after the flush
+        activity.touch(self.user1.id)
+        self.assertEqual(activity.flush(), 0)
+        logger.info('Activity write-behind test completed')
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=timedelta(milliseconds=200))
+    def test_activity_flush_timer(self):
+        """Test that buffered activity is flushed without further requests"""
+        flushed, threads = threading.Event(), []
+        
+        def flush():
+            threads.append(threading.current_thread())
+            flushed.set()
+        
+        with mock.patch('api.activity.flush', side_effect=flush):
+            activity.reset()
+            activity.touch(self.user1.id)
+            self.assertEqual(threads, [])
+            self.assertTrue(flushed.wait(5))
+        self.assertIsNot(threads[0], threading.main_thread())
+        logger.info('Activity flush timer test completed')
+
+    def test_profile_save_keeps_last_active(self):
+        """Test that editing a profile does not count as activity"""
+        before = self.profile1.last_active
+        self.profile1.bio = 'Changed'
+        self.profile1.save()
+        self.assertEqual(Profile.objects.get(pk=self.profile1.pk).last_active, before)
+        logger.info('Profile save last_active test completed')
+
+    def temporary_directory(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        return path
+
+    def temporary_media_root(self, **overrides):
+        return override_settings(MEDIA_ROOT=self.temporary_directory(), **overrides)
+
+    def make_jpeg(self, size=(300, 200), orientation=6):
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+        return ContentFile(buffer.getvalue(), name='upload.jpg')
+
+    def test_profile_picture_variants(self):
+        """Test that uploads are oriented, stripped and resized into variants after commit"""
+        with self.temporary_media_root(PROFILE_PICTURE_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.profile2.profile_picture = self.make_jpeg()
+                self.profile2.save()
+            upload = self.profile2.profile_picture.name
+            
+            self.profile2.refresh_from_db()
+            variants = self.profile2.picture_variants
+            self.assertEqual(variants['source'], self.profile2.profile_picture.name)
+            # The served original is upright and stripped, and the upload is gone
+            self.assertFalse(default_storage.exists(upload))
+            with self.profile2.profile_picture.open() as file, Image.open(file) as image:
+                self.assertEqual(image.size, (200, 300))
+                self.assertEqual(dict(image.getexif()), {})
+            with default_storage.open(variants['card']['webp']) as file, Image.open(file) as image:
+                self.assertEqual(image.format, 'WEBP')
+                # Rotated by the EXIF orientation, never upscaled
+                self.assertEqual(image.size, (200, 300))
+            with default_storage.open(variants['thumbnail']['jpeg']) as file, Image.open(file) as image:
+                self.assertEqual(max(image.size), 160)
+                self.assertNotIn(0x0112, image.getexif())
+            
+            self.client.force_authenticate(user=self.user1)
+            response = self.client.get(reverse('api:profile-detail', kwargs={'pk': self.profile2.id}))
+            urls = response.data['profile_picture_variants']
+            self.assertEqual(set(urls), {'thumbnail', 'card', 'full'})
+            self.assertTrue(urls['full']['webp'].startswith('http://testserver/media/'))
+            self.assertTrue(response.data['profile_picture'].endswith(self.profile2.profile_picture.name))
+        logger.info('Profile picture variants test completed')
+
+    def test_media_serving(self):
+        """Test content-hashed media with validators, ranges and sendfile hand-off"""
+        with self.temporary_media_root():
+            name = default_storage.save('docs/hello.txt', ContentFile(b'0123456789abcdef'))
+            self.assertRegex(name, r'^docs/hello\.[0-9a-f]{12}\.txt$')
+            self.assertEqual(default_storage.save('docs/hello.txt', ContentFile(b'0123456789abcdef')), name)
+            url = '/media/' + name
+            
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('immutable', response['Cache-Control'])
+            etag = response['ETag']
+            response.close()
+            
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            
+            response = self.client.get(url, HTTP_RANGE='bytes=10-')
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(b''.join(response.streaming_content), b'abcdef')
+            self.assertEqual(response['Content-Range'], 'bytes 10-15/16')
+            
+            response = self.client.get(url, HTTP_RANGE='bytes=-4')
+            self.assertEqual(b''.join(response.streaming_content), b'cdef')
+            response = self.client.get(url, HTTP_RANGE='bytes=100-')
+            self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            
+            with override_settings(MEDIA_SENDFILE='nginx'):
+                response = self.client.get(url)
+                self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + name)
+                self.assertEqual(response.content, b'')
+            
+            response = self.client.get('/media/../shiputy/settings.py')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        logger.info('Media serving test completed')
+
+    def obtain_access_token(self, username):
+        response = self.client.post(reverse('api:token_obtain_pair'), {
+            'username': username,
+            'password': 'testpass123'
+        })
+        return response.data['access']
+
+    def test_token_claims(self):
+        """Test that access tokens carry the claims authentication relies on"""
+        token = AccessToken(self.obtain_access_token('user1'))
+        self.assertEqual(token['username'], 'user1')
+        self.assertEqual(token[authentication.TOKEN_VERSION_CLAIM], 0)
+        # Profile fields would go stale in a token, so none are copied into it
+        self.assertNotIn('profile_id', token)
+        logger.info('Token claims test completed')
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=timedelta(hours=1))
+    def test_authentication_without_queries(self):
+        """Test that a warm auth context authenticates without touching the database"""
+        User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        access = self.obtain_access_token('admin')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('api:cache-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Users built from claims are not complete and refuse to be saved
+        user = authentication.CachedJWTAuthentication().get_user(AccessToken(access))
+        self.assertTrue(user.is_staff)
+        with self.assertRaises(RuntimeError):
+            user.save()
+        logger.info('Authentication without queries test completed')
+
+    def test_revoked_and_inactive_tokens(self):
+        """Test that revoking tokens or deactivating the user takes effect immediately"""
+        url = reverse('api:matches')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token('user1')}")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        stale = Profile.objects.get(pk=self.profile1.pk)
+        authentication.revoke_tokens(self.user1.id)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        # Saving an instance loaded before the revocation does not undo it
+        stale.bio = 'Edited'
+        stale.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        # A token issued after the revocation works again
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token('user1')}")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token('user2')}")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user2.is_active = False
+        self.user2.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        # Without a profile there is nowhere to record the revocation
+        self.profile3.delete()
+        with self.assertRaises(Profile.DoesNotExist):
+            authentication.revoke_tokens(self.user3.id)
+        logger.info('Revoked and inactive tokens test completed')
+
+    def test_profile_search(self):
+        """Test that search matches indexed username and location tokens"""
+        def found(query):
+            return set(search.search(Profile.objects.all(), query).values_list('id', flat=True))
+        
+        self.assertEqual(found('city'), {self.profile1.id, self.profile2.id, self.profile3.id})
+        self.assertEqual(found('Cit 2'), {self.profile2.id})
+        self.assertEqual(found('USER1'), {self.profile1.id})
+        self.assertEqual(found('city 4'), set())
+        
+        # The index follows profile saves, renames and deletes
+        self.profile2.location = 'São Paulo'
+        self.profile2.save()
+        self.assertEqual(found('sao paul'), {self.profile2.id})
+        self.assertEqual(found('city 2'), set())
+        self.user2.username = 'maria_silva'
+        self.user2.save()
+        self.assertEqual(found('silva'), {self.profile2.id})
+        self.assertEqual(found('user2'), set())
+        self.user3.delete()
+        self.assertEqual(found('city'), {self.profile1.id})
+        
+        self.client.force_authenticate(user=self.user1)
+        url = reverse('api:profile-list')
+        response = self.client.get(url, {'search': 'paulo'})
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.profile2.id])
+        response = self.client.get(url, {'search': 'lisbon'})
+        self.assertEqual(response.data['results'], [])
+        logger.info('Profile search test completed')
+
+    async def test_async_views(self):
+        """Test that the async views match their sync counterparts"""
+        client = AsyncClient()
+        user1 = {'Authorization': f"Bearer {self.get_tokens_for_user(self.user1)['access']}"}
+        user2 = {'Authorization': f"Bearer {self.get_tokens_for_user(self.user2)['access']}"}
+        
+        response = await client.get(reverse('api:async-matches'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await client.get(reverse('api:async-like-profile', args=[self.profile2.id]), headers=user1)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        
+        response = await client.get(reverse('api:async-profile-list'), headers=user1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([profile['id'] for profile in response.json()['results']], [self.profile2.id])
+        
+        response = await client.post(reverse('api:async-like-profile', args=[self.profile2.id]), headers=user1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json(), {'detail': 'Like created'})
+        response = await client.post(reverse('api:async-like-profile', args=[self.profile1.id]), headers=user2)
+        self.assertEqual(response.json(), {'detail': 'It\'s a match!'})
+        response = await client.post(reverse('api:async-like-profile', args=[0]), headers=user2)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = await client.get(reverse('api:async-matches'), headers=user1)
+        matches = response.json()['results']
+        self.assertEqual([match['user']['id'] for match in matches], [self.user2.id])
+        self.assertEqual(matches[0]['profile']['id'], self.profile2.id)
+        
+        # Same payload as the sync endpoint
+        sync_response = await sync_to_async(self.client.get)(reverse('api:matches'), headers=user1)
+        self.assertEqual(response.json(), sync_response.json())
+        logger.info('Async views test completed')
+
+    async def test_event_stream(self):
+        """Test that likes and matches are pushed to connected clients, naming likers to premium users only"""
+        def swipe(user, profile):
+            with self.captureOnCommitCallbacks(execute=True):
+                matching.like(user, profile.id)
+        
+        async def next_event(stream):
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+            fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+            return fields['event'], json.loads(fields['data'])
+        
+        client = AsyncClient()
+        headers = {'Authorization': f"Bearer {self.get_tokens_for_user(self.user1)['access']}"}
+        response = await client.get(reverse('api:events'), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry: '))
+        
+        await sync_to_async(swipe)(self.user2, self.profile1)
+        self.assertEqual(await next_event(stream), ('like', {'type': 'like', 'user': self.user2.id}))
+        await sync_to_async(swipe)(self.user1, self.profile2)
+        event, data = await next_event(stream)
+        self.assertEqual((event, data['user']), ('match', self.user2.id))
+        
+        # Free users hear that someone liked them, but not who
+        free = {'Authorization': f"Bearer {self.get_tokens_for_user(self.user3)['access']}"}
+        free_stream = aiter((await client.get(reverse('api:events'), headers=free)).streaming_content)
+        await anext(free_stream)
+        await sync_to_async(swipe)(self.user2, self.profile3)
+        self.assertEqual(await next_event(free_stream), ('like', {'type': 'like'}))
+        
+        # Sync servers refuse the endless stream
+        response = await sync_to_async(self.client.get)(reverse('api:events'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        logger.info('Event stream test completed')
+
+    def test_local_broker_with_several_workers(self):
+        """Test that the process-local event broker warns when several workers would split the clients"""
+        with mock.patch.object(events, '_broker', None), override_settings(WEB_CONCURRENCY=4):
+            with self.assertLogs('api.events', 'WARNING') as logs:
+                self.assertIsInstance(events.get_broker(), events.LocalBroker)
+        self.assertIn('EVENTS_BROKER', logs.output[0])
+        
+        with mock.patch.object(events, '_broker', None), self.assertNoLogs('api.events', 'WARNING'):
+            events.get_broker()
+        logger.info('Local broker warning test completed')
+
+    def test_seed_data_and_benchmark_budgets(self):
+        """Test seeding a synthetic dataset and checking endpoints against budgets"""
+        call_command('seed_data', profiles=60, likes=8, stdout=io.StringIO())
+        seeded = Profile.objects.filter(user__username__startswith='seed')
+        self.assertEqual(seeded.count(), 60)
+        self.assertTrue(all(profile.geohash and profile.profile_completion for profile in seeded))
+        self.assertEqual(UserMatch.objects.count(), 2 * Match.objects.count())
+        self.assertTrue(search.search(seeded, 'istanbul').exists())
+        
+        budgets = os.path.join(self.temporary_directory(), 'budgets.json')
+        options = {'users': 3, 'requests': 5, 'budgets': budgets, 'stdout': io.StringIO()}
+        call_command('benchmark', update_budgets=True, headroom=100, **options)
+        with open(budgets) as file:
+            self.assertEqual(set(json.load(file)), {'profile-list', 'profile-detail', 'profile-search', 'like', 'matches', 'likes'})
+        call_command('benchmark', endpoints=['matches'], **options)
+        
+        with open(budgets, 'w') as file:
+            json.dump({'matches': {'queries': 0}}, file)
+        with self.assertRaisesMessage(CommandError, 'matches: queries'):
+            call_command('benchmark', endpoints=['matches'], **options)
+        logger.info('Seed data and benchmark budgets test completed')
+
+    def test_request_instrumentation(self):
+        """Test per-request query timing, N+1 detection and per-view stats"""
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:matches'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+        
+        with instrumentation.recording() as recorder:
+            for profile in (self.profile1, self.profile2, self.profile3):
+                Profile.objects.filter(user_id__in=[profile.user_id, 0]).first()
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(list(recorder.repeated(3).values()), [3])
+        
+        with override_settings(INSTRUMENTATION_N_PLUS_ONE=1):
+            with self.assertLogs('api.middleware', 'WARNING') as logs:
+                self.client.get(reverse('api:matches'))
+        self.assertIn('Possible N+1 in GET api:matches', logs.output[0])
+        
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        stats = self.client.get(reverse('api:request-stats')).data['views']
+        matches = stats['GET api:matches']
+        self.assertEqual(matches['count'], 2)
+        self.assertEqual(matches['n_plus_one'], 1)
+        self.assertGreater(matches['mean_queries'], 0)
+        self.assertEqual(sum(matches['histogram_ms'].values()), 2)
+        logger.info('Request instrumentation test completed')
+
+    def test_fast_read_path_matches_serializers(self):
+        """Test that the values()-based read path renders the serializers' exact bytes"""
+        Profile.objects.filter(pk=self.profile2.pk).update(
+            profile_picture='profile_pics/photo.jpg',
+            picture_variants={'source': 'profile_pics/photo.jpg', 'thumbnail': {'webp': 'profile_pics/t.webp'}},
+            bio='Line\u2028separated, ünïcode and "quotes"',
+            birth_date=None,
+        )
+        Profile.objects.filter(pk=self.profile3.pk).update(last_active=timezone.now().replace(microsecond=123456))
+        matching.like(self.user1, self.profile2.id)
+        matching.like(self.user2, self.profile1.id)
+        self.user3.profile.delete()
+        Match.objects.create(user1=self.user1, user2=self.user3)
+        request = APIRequestFactory().get('/api/profiles/')
+        
+        def compare(slow, fast):
+            cache.clear()
+            expected = JSONRenderer().render(slow())
+            cache.clear()
+            self.assertEqual(rendering.FastJSONRenderer().render(fast()), expected)
+            with mock.patch.object(rendering, 'orjson', None):
+                cache.clear()
+                self.assertEqual(rendering.FastJSONRenderer().render(fast()), expected)
+        
+        profiles = Profile.objects.select_related('user').order_by('id')
+        compare(
+            lambda: ProfileSerializer(profiles, many=True, context={'request': request}).data,
+            lambda: rendering.profiles_data(list(profiles.values(*rendering.profile_values())), request),
+        )
+        user_matches = UserMatch.objects.filter(user=self.user1).order_by('id')
+        compare(
+            lambda: UserMatchSerializer(
+                user_matches.select_related('other_user__profile'), many=True, context={'request': request}
+            ).data,
+            lambda: rendering.matches_data(list(user_matches.values(*rendering.match_values())), request),
+        )
+        self.assertEqual(len(UserMatch.objects.filter(user=self.user1)), 2)
+        logger.info('Fast read path test completed')
+
+    def test_cached_profile_urls(self):
+        """Test that picture URLs do not depend on which caller filled the profile cache"""
+        Profile.objects.filter(pk=self.profile2.pk).update(
+            profile_picture='profile_pics/photo.jpg',
+            picture_variants={'source': 'profile_pics/photo.jpg', 'thumbnail': {'jpeg': 'profile_pics/t.jpg'}},
+        )
+        matching.like(self.user1, self.profile2.id)
+        matching.like(self.user2, self.profile1.id)
+        rows = list(UserMatch.objects.filter(user=self.user1).values(*rendering.match_values()))
+        relative = rendering.matches_data(rows)[0]['profile']
+        self.assertEqual(relative['profile_picture'], '/media/profile_pics/photo.jpg')
+        
+        # The cache now holds the profile, filled without a request
+        self.client.force_authenticate(user=self.user1)
+        for url in (reverse('api:matches'), reverse('api:profile-detail', args=[self.profile2.id])):
+            response = self.client.get(url)
+            profile = response.data['results'][0]['profile'] if 'results' in response.data else response.data
+            self.assertEqual(profile['profile_picture'], 'http://testserver/media/profile_pics/photo.jpg')
+            self.assertEqual(
+                profile['profile_picture_variants'], {'thumbnail': {'jpeg': 'http://testserver/media/profile_pics/t.jpg'}}
+            )
+        self.assertEqual(rendering.matches_data(rows)[0]['profile'], relative)
+        logger.info('Cached profile URLs test completed')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_replica_reads_and_stickiness(self):
+        """Test that profile and match reads go to the replica until the reader writes"""
+        matching.like(self.user1, self.profile2.id)
+        matching.like(self.user2, self.profile1.id)
+        cache.clear()
+        self.client.force_authenticate(user=self.user1)
+        
+        # Reads come from the replica, which has not seen the match yet
+        response = self.client.get(reverse('api:matches'))
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(reverse('api:profile-detail', args=[self.profile2.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # Blocking is a write, after which user1 reads from the primary
+        response = self.client.post(reverse('api:profile-block', args=[self.profile3.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(routers.is_pinned(self.user1.id))
+        response = self.client.get(reverse('api:matches'))
+        self.assertEqual(response.data['results'][0]['user']['id'], self.user2.id)
+        response = self.client.get(reverse('api:profile-detail', args=[self.profile2.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Other users still read from the replica
+        self.client.force_authenticate(user=self.user3)
+        response = self.client.get(reverse('api:matches'))
+        self.assertEqual(response.data['results'], [])
+        
+        # Within a block, reads after a write go to the primary too
+        router = routers.ReplicaRouter()
+        with routers.replica_reads(self.user3.id):
+            self.assertEqual(router.db_for_read(Like), 'replica')
+            self.assertEqual(router.db_for_write(Like), 'default')
+            self.assertEqual(router.db_for_read(Like), 'default')
+        self.assertEqual(router.db_for_read(Like), 'default')
+        with override_settings(DATABASE_REPLICAS=[]), routers.replica_reads(self.user3.id):
+            self.assertEqual(router.db_for_read(Like), 'default')
+        logger.info('Replica routing test completed')
+
+    def test_sqlite_tuning_and_connection_benchmark(self):
+        """Test that SQLite connections are tuned on connect and the connection benchmark runs"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        
+        out = io.StringIO()
+        call_command('benchmark_connections', requests=20, queries=2, stdout=out)
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual([row[0] for row in rows], ['connect', 'persistent'])
+        self.assertEqual(float(rows[0][-1]), 0)
+        logger.info('SQLite tuning test completed')
+
+    def test_shared_cache_with_several_workers(self):
+        """Test that several worker processes never get a per-process cache"""
+        def backend(**env):
+            environ = {name: value for name, value in os.environ.items() if name not in ('CACHE_DIR', 'WEB_CONCURRENCY')}
+            result = subprocess.run(
+                [sys.executable, '-c', "from shiputy import settings; print(settings.CACHES['default']['BACKEND'])"],
+                env={**environ, **env}, capture_output=True, text=True, check=True,
+            )
+            return result.stdout.strip().rsplit('.', 1)[-1]
+        
+        self.assertEqual(backend(), 'LocMemCache')
+        self.assertEqual(backend(WEB_CONCURRENCY='1'), 'LocMemCache')
+        self.assertEqual(backend(WEB_CONCURRENCY='4'), 'FileBasedCache')
+        self.assertEqual(backend(CACHE_DIR=tempfile.gettempdir()), 'FileBasedCache')
+        logger.info('Shared cache test completed')
+
+    def test_engagement_counters(self):
+        """Test that like, match and block counters follow writes and deletes and can be repaired"""
+        def counts(profile):
+            profile.refresh_from_db()
+            return [getattr(profile, field) for field in Profile.COUNTER_FIELDS]
+        
+        url = reverse('api:profile-detail', args=[self.profile2.id])
+        self.client.force_authenticate(user=self.user3)
+        self.client.get(url)
+        stale = Profile.objects.get(pk=self.profile2.pk)
+        self.client.force_authenticate(user=self.user1)
+        self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile2.id}))
+        self.client.force_authenticate(user=self.user2)
+        self.client.post(reverse('api:like-profile', kwargs={'profile_id': self.profile1.id}))
+        self.client.force_authenticate(user=self.user3)
+        swipes = [{'profile_id': self.profile1.id, 'action': 'like'}, {'profile_id': self.profile2.id, 'action': 'like'}]
+        self.client.post(reverse('api:swipe-batch'), {'swipes': swipes}, format='json')
+        # likes received, likes given, matches, blocks received
+        self.assertEqual(counts(self.profile1), [2, 1, 1, 0])
+        self.assertEqual(counts(self.profile2), [2, 1, 1, 0])
+        self.assertEqual(counts(self.profile3), [0, 2, 0, 0])
+        
+        # Likes keep the cached representation, which gets the counters merged in on read
+        self.assertEqual(self.profile2.cache_version, stale.cache_version)
+        stats = caching.profile_cache_stats()
+        response = self.client.get(url)
+        self.assertEqual(caching.profile_cache_stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(response.data['likes_received'], 2)
+        
+        # Saving an instance loaded before those likes keeps the counters
+        stale.bio = 'Updated bio'
+        stale.save()
+        self.assertEqual(counts(self.profile2), [2, 1, 1, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.data['likes_received'], 2)
+        self.assertEqual(response.data['matches_count'], 1)
+        self.assertNotIn('blocks_received', response.data)
+        
+        self.client.force_authenticate(user=self.user1)
+        self.client.post(reverse('api:profile-block', kwargs={'pk': self.profile3.id}))
+        self.assertEqual(counts(self.profile3)[3], 1)
+        unblocked = Profile.objects.get(pk=self.profile3.pk)
+        unblocked.blocks_received = 0
+        self.assertLess(scoring.score_row(self.profile2, self.profile3), scoring.score_row(self.profile2, unblocked))
+        UserBlock.objects.filter(blocker=self.user1).delete()
+        self.assertEqual(counts(self.profile3)[3], 0)
+        
+        Match.objects.get().delete()
+        Like.objects.get(from_user=self.user1).delete()
+        self.assertEqual(counts(self.profile1), [2, 0, 0, 0])
+        self.assertEqual(counts(self.profile2), [1, 1, 0, 0])
+        self.user3.delete()
+        self.assertEqual(counts(self.profile1), [1, 0, 0, 0])
+        self.assertEqual(counts(self.profile2), [0, 1, 0, 0])
+        
+        Profile.objects.update(likes_received=7, matches_count=3)
+        out = io.StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('Repaired the counters of 2 profiles', out.getvalue())
+        self.assertEqual(counts(self.profile1), [1, 0, 0, 0])
+        self.assertEqual(counts(self.profile2), [0, 1, 0, 0])
+        logger.info('Engagement counters test completed')
+
+    def test_vectorized_scoring(self):
+        """Test that vectorized feed scores match the row-by-row reference and rank the feed"""
+        Profile.objects.filter(pk=self.profile1.pk).update(latitude=41.0, longitude=29.0, preferred_gender='A')
+        Profile.objects.filter(pk=self.profile2.pk).update(latitude=41.1, longitude=29.1, is_verified=True)
+        Profile.objects.filter(pk=self.profile3.pk).update(birth_date=None, likes_received=30)
+        profiles = list(Profile.objects.order_by('id'))
+        now = timezone.now()
+        
+        candidates = scoring.columns([tuple(getattr(p, name) for name in scoring.COLUMNS) for p in profiles])
+        for viewer in profiles:
+            scores = scoring.score(scoring.profile_columns(viewer), candidates, now)
+            for score, candidate in zip(scores, profiles):
+                self.assertAlmostEqual(score, scoring.score_row(viewer, candidate, now))
+        # Either side can be the many
+        scores = scoring.score(candidates, scoring.profile_columns(profiles[1]), now)
+        for score, viewer in zip(scores, profiles):
+            self.assertAlmostEqual(score, scoring.score_row(viewer, profiles[1], now))
+        
+        self.assertEqual(scoring.top_k(scoring.np.array([0.2, 0.9, 0.5, 0.7]), 2).tolist(), [1, 3])
+        self.assertEqual(scoring.top_k(scoring.np.array([0.2, 0.9]), 5).tolist(), [1, 0])
+        with override_settings(FEED_SCORE_WEIGHTS={'verified': 0}):
+            self.assertEqual(scoring.get_weights()['verified'], 0)
+        
+        # user1 and user3 take anyone, so user3 sees both others, ranked by score
+        self.client.force_authenticate(user=self.user3)
+        response = self.client.get(reverse('api:profile-list'))
+        viewer = profiles[2]
+        ranked = sorted(profiles[:2], key=lambda candidate: -scoring.score_row(viewer, candidate))
+        self.assertEqual([profile['id'] for profile in response.data['results']], [p.id for p in ranked])
+        
+        out = io.StringIO()
+        call_command('benchmark_scoring', candidates=300, top=20, requests=2, stdout=out)
+        self.assertIn('Top 20 agreement: 20/20', out.getvalue())
+        logger.info('Vectorized scoring test completed')
+
+    def test_received_likes(self):
+        """Test the premium list of users who liked me and the unread like count"""
+        matching.like(self.user2, self.profile1.id)
+        matching.like(self.user3, self.profile1.id)
+        url = reverse('api:received-likes')
+        unread_url = reverse('api:received-likes-unread')
+        
+        # Free users only get the count
+        self.client.force_authenticate(user=self.user2)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(unread_url).data, {'unread': 0, 'more': False})
+        
+        self.client.force_authenticate(user=self.user1)
+        self.assertEqual(self.client.get(unread_url).data, {'unread': 2, 'more': False})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([like['user']['id'] for like in response.data['results']], [self.user3.id, self.user2.id])
+        self.assertEqual(response.data['results'][0]['profile']['id'], self.profile3.id)
+        self.assertEqual(self.client.get(unread_url).data['unread'], 0)
+        
+        # Liking back (a match) and blocking both remove the like
+        matching.like(self.user1, self.profile2.id)
+        response = self.client.get(url)
+        self.assertEqual([like['user']['id'] for like in response.data['results']], [self.user3.id])
+        UserBlock.objects.create(blocker=self.user1, blocked=self.user3)
+        self.assertEqual(self.client.get(url).data['results'], [])
+        
+        # The scan and the liked-back probe never touch the table
+        plan = matching.received_likes(self.user1.id).filter(created_at__gt=timezone.now()).explain()
+        self.assertIn('COVERING INDEX like_to_user_created_idx', plan)
+        self.assertIn('COVERING INDEX sqlite_autoindex_api_like_1', plan)
+        
+        # Losing premium takes effect right away
+        self.profile1.is_premium = False
+        self.profile1.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        logger.info('Received likes test completed')
+
+    def test_seen_filter(self):
+        """Test that liked and passed users never come back in the feed, through the seen Bloom filter"""
+        bloom = seen.BloomFilter.of(list(range(0, 20000, 2)))
+        self.assertTrue(bloom.contains(list(range(0, 20000, 2))).all())
+        self.assertLess(bloom.contains(list(range(1, 20000, 2))).mean(), 0.02)
+        restored = seen.BloomFilter.from_bytes(bloom.to_bytes(), bloom.items)
+        self.assertEqual(restored.contains([4, 5]).tolist(), bloom.contains([4, 5]).tolist())
+        
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.profile2.id])
+        self.assertEqual(SeenFilter.objects.get(user=self.user1).items, 0)
+        
+        swipes = [{'profile_id': self.profile2.id, 'action': 'pass'}]
+        self.client.post(reverse('api:swipe-batch'), {'swipes': swipes}, format='json')
+        self.assertTrue(seen.load(self.user1.id).contains([self.user2.id])[0])
+        Feed.objects.all().delete()
+        response = self.client.get(reverse('api:profile-list'))
+        self.assertEqual(response.data['results'], [])
+        
+        # Positives that could make the cut are confirmed, so a filter claiming everything hides only real swipes
+        user_ids = scoring.np.array([self.user2.id, self.user3.id])
+        scores = scoring.np.array([2.0, 1.0])
+        with mock.patch.object(seen.BloomFilter, 'contains', lambda self, ids: scoring.np.ones(len(ids), dtype=bool)):
+            self.assertEqual(seen.best_unseen(self.user1.id, user_ids, scores, 2).tolist(), [1])
+            # Only the best positive is looked up for a one-entry feed
+            self.assertEqual(seen.best_unseen(self.user1.id, user_ids, scores, 1).tolist(), [])
+        
+        # Only the best k plus the filter's positives are ranked, never all the candidates
+        user_ids = scoring.np.array([self.user2.id, self.user3.id, self.user1.id])
+        scores = scoring.np.array([3.0, 2.0, 1.0])
+        with mock.patch.object(scoring, 'top_k', wraps=scoring.top_k) as top_k:
+            self.assertEqual(seen.best_unseen(self.user1.id, user_ids, scores, 1).tolist(), [1])
+        self.assertEqual(top_k.call_args.args[1], 2)
+        
+        # A full filter is rebuilt exactly, with room to grow
+        SeenFilter.objects.filter(user=self.user1).update(items=5000)
+        matching.like(self.user1, self.profile3.id)
+        stored = SeenFilter.objects.get(user=self.user1)
+        self.assertEqual(stored.items, 2)
+        self.assertEqual(seen.load(self.user1.id).contains([self.user2.id, self.user3.id]).tolist(), [True, True])
+        
+        # Passes written outside the swipe paths reach the filter; bulk writes need a reset
+        seen.load(self.user2.id)
+        Pass.objects.create(from_user=self.user2, to_user=self.user3)
+        Like.objects.bulk_create([Like(from_user=self.user2, to_user=self.user1)])
+        self.assertEqual(seen.load(self.user2.id).contains([self.user3.id, self.user1.id]).tolist(), [True, False])
+        seen.reset([self.user2.id])
+        self.assertEqual(seen.load(self.user2.id).contains([self.user3.id, self.user1.id]).tolist(), [True, True])
+        logger.info('Seen filter test completed')
+
+    def test_feed_build_budget_for_heavy_swipers(self):
+        """Test that a feed build reads and confirms a bounded number of rows however much the user swiped"""
+        profiles = []
+        for number in range(30):
+            user = User.objects.create(username=f'swiped{number}')
+            profiles.append(Profile.objects.create(
+                user=user, birth_date=birth_date_for_age(25), gender='F', preferred_gender='M',
+                last_active=timezone.now() - timedelta(minutes=30 - number),
+            ))
+        # The 25 most recently active, so the first two batches are entirely seen
+        matching.swipe_batch(self.user1, [(profile.id, matching.PASS) for profile in profiles[5:]])
+        seen.load(self.user1.id)
+        Feed.objects.all().delete()
+        
+        with mock.patch('api.feed.FEED_CANDIDATES', 10), mock.patch('api.feed.FEED_SIZE', 4):
+            with CaptureQueriesContext(connection) as queries:
+                built = feed.build_feed(self.user1)
+        entries = set(built.entries.values_list('profile_id', flat=True))
+        self.assertEqual(len(entries), 4)
+        self.assertFalse(entries & {profile.id for profile in profiles[5:]})
+        
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([query for query in sql if 'LIMIT 10' in query]), 3)
+        lookups = [query for query in sql if '"api_like"' in query or '"api_pass"' in query]
+        self.assertEqual(len(lookups), 2)
+        for query in lookups:
+            self.assertLessEqual(len(re.search(r'"to_user_id" IN \(([^)]*)\)', query).group(1).split(',')), 4)
+        logger.info('Heavy swiper feed build test completed')
@@ -12,7 +12,17 @@ app_name = 'api'
 urlpatterns = [
     path('', include(router.urls)),
     path('like/<int:profile_id>/', views.like_profile, name='like-profile'),
+    path('swipes/', views.swipe_batch, name='swipe-batch'),
     path('matches/', views.get_matches, name='matches'),
+    path('likes/', views.get_likes, name='likes'),
+    path('likes/received/', views.get_received_likes, name='received-likes'),
+    path('likes/received/unread/', views.received_likes_unread, name='received-likes-unread'),
+    path('stats/cache/', views.cache_stats, name='cache-stats'),
+    path('stats/requests/', views.request_stats, name='request-stats'),
+    path('async/like/<int:profile_id>/', views.async_like_profile, name='async-like-profile'),
+    path('async/matches/', views.async_get_matches, name='async-matches'),
+    path('async/profiles/', views.async_profile_list, name='async-profile-list'),
+    path('events/', views.event_stream, name='events'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ] 
\ No newline at end of file
@@ -1,15 +1,22 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db.models import Q
-from .models import Profile, Match, Like, UserBlock, Report
-from .serializers import ProfileSerializer, MatchSerializer, LikeSerializer, ReportSerializer
+from .models import Profile, UserMatch, Like, UserBlock
+from .serializers import ProfileSerializer, LikeSerializer, ReportSerializer, SwipeBatchSerializer
 from rest_framework import filters
+from rest_framework.generics import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import CustomTokenObtainPairSerializer
+from .pagination import FeedPagination, MatchPagination, LikePagination
+from .filters import ProfileSearchFilter, RadiusFilter
+from .decorators import async_api_view, render
+from .permissions import IsPremium
+from . import caching, events, feed, hidden, instrumentation, matching, rendering, routers
 
 # Create your views here.
 
@@ -20,27 +27,50 @@ class ProfileViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ProfileSerializer
     queryset = Profile.objects.all()
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    search_fields = ['user__username', 'location']
-    filterset_fields = ['gender', 'location']
+    filter_backends = [DjangoFilterBackend, ProfileSearchFilter, RadiusFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'gender': ['exact'],
+        'location': ['exact'],
+        'profile_completion': ['gte', 'lte'],
+    }
+    ordering_fields = ['profile_completion']
+    pagination_class = FeedPagination
     
     def get_queryset(self):
         user = self.request.user
+        # For list view, serve pages of the precomputed feed
+        if self.action == 'list':
+            return feed.feed_queryset(user)
+            
+        hidden_users = hidden.hidden_user_ids(user.id)
         if self.action == 'retrieve':
-            return Profile.objects.all()
+            return Profile.objects.exclude(user_id__in=hidden_users)
             
-        # For list view
-        blocked_users = UserBlock.objects.filter(blocker=user).values_list('blocked', flat=True)
-        queryset = Profile.objects.exclude(
+        return Profile.objects.exclude(
             Q(user=user) | 
-            Q(user__in=blocked_users)
+            Q(user_id__in=hidden_users)
         )
-        
-        # Filter based on gender preferences
-        if user.profile.preferred_gender != 'A':
-            queryset = queryset.filter(gender=user.profile.preferred_gender)
-        
-        return queryset
+    
+    # Reads skip the serializers; the payload is ProfileSerializer's (see api.rendering)
+    def list(self, request, *args, **kwargs):
+        with routers.replica_reads(request.user.id):
+            page = self.paginator.paginate_queryset(self.list_values(), request, view=self)
+            return self.paginator.get_paginated_response(rendering.profiles_data(page, request))
+    
+    def list_values(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = rendering.profile_values()
+        # Keyset pagination reads the ordering values from the rows
+        for key in self.paginator.get_ordering(queryset):
+            if key.lstrip('-') not in columns:
+                columns.append(key.lstrip('-'))
+        return queryset.values(*columns)
+    
+    def retrieve(self, request, *args, **kwargs):
+        with routers.replica_reads(request.user.id):
+            queryset = self.filter_queryset(self.get_queryset()).values(*rendering.profile_values())
+            row = get_object_or_404(queryset, pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+            return Response(rendering.profiles_data([row], request)[0])
     
     @action(detail=True, methods=['post'])
     def block(self, request, pk=None):
@@ -57,34 +87,128 @@ class ProfileViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Response detail and status of each outcome of a like
+LIKE_RESPONSES = {
+    matching.NOT_FOUND: ('Profile not found', status.HTTP_404_NOT_FOUND),
+    matching.OWN_PROFILE: ('Cannot like your own profile', status.HTTP_400_BAD_REQUEST),
+    matching.ALREADY_LIKED: ('Already liked', status.HTTP_400_BAD_REQUEST),
+    matching.MATCHED: ('It\'s a match!', status.HTTP_201_CREATED),
+    matching.LIKED: ('Like created', status.HTTP_201_CREATED),
+}
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def like_profile(request, profile_id):
-    try:
-        to_user = Profile.objects.get(id=profile_id).user
-        from_user = request.user
-        
-        # Check if like already exists
-        if Like.objects.filter(from_user=from_user, to_user=to_user).exists():
-            return Response({'detail': 'Already liked'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create new like
-        like = Like.objects.create(from_user=from_user, to_user=to_user)
-        
-        # Check if there's a mutual like
-        if Like.objects.filter(from_user=to_user, to_user=from_user).exists():
-            # Create a match
-            Match.objects.create(user1=from_user, user2=to_user)
-            return Response({'detail': 'It\'s a match!'}, status=status.HTTP_201_CREATED)
-        
-        return Response({'detail': 'Like created'}, status=status.HTTP_201_CREATED)
+    detail, code = LIKE_RESPONSES[matching.like(request.user, profile_id)]
+    return Response({'detail': detail}, status=code)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def swipe_batch(request):
+    serializer = SwipeBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    swipes = [(swipe['profile_id'], swipe['action']) for swipe in serializer.validated_data['swipes']]
     
-    except Profile.DoesNotExist:
-        return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    results = matching.swipe_batch(request.user, swipes)
+    return Response({'results': [
+        {'profile_id': profile_id, 'action': action, 'result': result}
+        for (profile_id, action), result in zip(swipes, results)
+    ]})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_matches(request):
-    matches = Match.objects.filter(Q(user1=request.user) | Q(user2=request.user))
-    serializer = MatchSerializer(matches, many=True)
-    return Response(serializer.data)
+    # One index range over the caller's own rows, newest first
+    matches = UserMatch.objects.filter(user=request.user).values(*rendering.match_values())
+    paginator = MatchPagination()
+    with routers.replica_reads(request.user.id):
+        page = paginator.paginate_queryset(matches, request)
+    return paginator.get_paginated_response(rendering.matches_data(page, request))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_likes(request):
+    likes = Like.objects.filter(from_user=request.user).select_related('from_user', 'to_user')
+    paginator = LikePagination()
+    page = paginator.paginate_queryset(likes, request)
+    serializer = LikeSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+# Unread like counts stop here; clients show "99+"
+UNREAD_LIKES_LIMIT = 99
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsPremium])
+def get_received_likes(request):
+    """Users who liked the caller and whom they have not liked back, newest first."""
+    likes = matching.received_likes(request.user.id).values(*rendering.received_like_values())
+    paginator = LikePagination()
+    page = paginator.paginate_queryset(likes, request)
+    if page and paginator.cursor_query_param not in request.query_params:
+        # The first page shows the newest likes, so everything up to them is now read
+        newest = page[0]['created_at']
+        Profile.objects.filter(Q(likes_seen_at__isnull=True) | Q(likes_seen_at__lt=newest), user=request.user).update(
+            likes_seen_at=newest
+        )
+    return paginator.get_paginated_response(rendering.received_likes_data(page, request))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def received_likes_unread(request):
+    """How many likes arrived since the caller last listed them; free users see it too."""
+    seen_at = Profile.objects.filter(user=request.user).values_list('likes_seen_at', flat=True).first()
+    likes = matching.received_likes(request.user.id)
+    if seen_at is not None:
+        likes = likes.filter(created_at__gt=seen_at)
+    # Counting stops at the limit, so popular profiles cost the same as everyone else
+    unread = likes[:UNREAD_LIKES_LIMIT + 1].count()
+    return Response({'unread': min(unread, UNREAD_LIKES_LIMIT), 'more': unread > UNREAD_LIKES_LIMIT})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response({'profile_cache': caching.profile_cache_stats()})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_stats(request):
+    return Response({'views': instrumentation.request_stats()})
+
+# Async versions of the hottest endpoints, for the ASGI deployment. They
+# return the same payloads as their sync counterparts.
+
+@async_api_view(['POST'])
+async def async_like_profile(request, profile_id):
+    # Liking locks both profiles in a transaction, which the async ORM cannot do yet
+    result = await sync_to_async(matching.like)(request.user, profile_id)
+    detail, code = LIKE_RESPONSES[result]
+    return render({'detail': detail}, code)
+
+@async_api_view(['GET'])
+async def async_get_matches(request):
+    matches = UserMatch.objects.filter(user=request.user).values(*rendering.match_values())
+    paginator = MatchPagination()
+    with routers.replica_reads(request.user.id):
+        page = await paginator.apaginate_queryset(matches, request)
+    return render(paginator.get_paginated_data(rendering.matches_data(page, request)))
+
+@async_api_view(['GET'])
+async def async_profile_list(request):
+    # Same feed, filters and ordering as ProfileViewSet.list
+    view = ProfileViewSet(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+    with routers.replica_reads(request.user.id):
+        profiles = await sync_to_async(view.list_values)()
+        page = await view.paginator.apaginate_queryset(profiles, request)
+        return render(view.paginator.get_paginated_data(rendering.profiles_data(page, request)))
+
+@async_api_view(['GET'])
+async def event_stream(request):
+    """Server-Sent Events with the caller's new likes and matches, as they happen."""
+    # A sync server would buffer the endless stream and tie up a worker for good
+    if getattr(request, 'scope', None) is None:
+        return render({'detail': 'Events are only served by the ASGI deployment.'}, status.HTTP_503_SERVICE_UNAVAILABLE)
+    return StreamingHttpResponse(
+        events.stream(request.user.id),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shiputy.settings')
 
 application = get_asgi_application()
+
+# Create the event broker now, so a broker that cannot serve several
+# workers is reported when the worker starts
+from api import events  # noqa: E402
+
+events.get_broker()
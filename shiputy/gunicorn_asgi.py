@@ -0,0 +1,23 @@
+"""
+gunicorn config for the ASGI deployment: `gunicorn -c shiputy/gunicorn_asgi.py`.
+
+Each uvicorn worker runs an event loop, so one process holds many in-flight
+requests; the async views under /api/async/ wait on the database without
+blocking it. Use one worker per core rather than the sync deployment's
+worker-per-concurrent-request. The default EVENTS_BROKER only reaches
+clients of the publishing worker; set EVENTS_BROKER to a shared broker, or
+WEB_CONCURRENCY=1, for the event stream to reach every client.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('SERVER_MODE', 'asgi')
+# Exported so the settings see more than one worker and share the cache between them
+os.environ.setdefault('WEB_CONCURRENCY', str(multiprocessing.cpu_count()))
+
+wsgi_app = 'shiputy.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ['WEB_CONCURRENCY'])
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+keepalive = 5
+graceful_timeout = 30
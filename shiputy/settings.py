@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 from datetime import timedelta
 
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -57,8 +59,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ActivityMiddleware',
 ]
 
+# 'asgi' when served by shiputy/gunicorn_asgi.py. Under ASGI a sync-only
+# middleware funnels every request through one thread, so WhiteNoise is left
+# out there and static files must come from the front proxy.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+if SERVER_MODE == 'asgi':
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'shiputy.urls'
 
 TEMPLATES = [
@@ -83,15 +94,118 @@ WSGI_APPLICATION = 'shiputy.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite tuning, applied on every connection unless SQLITE_TUNING=0. WAL lets
+# reads run alongside a write and synchronous=NORMAL is durable at WAL
+# checkpoints; mmap and a larger page cache save read syscalls. busy_timeout
+# waits for the write lock instead of failing with "database is locked", and
+# IMMEDIATE transactions take that lock up front, so concurrent writers queue
+# rather than fail to upgrade a read lock.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,  # milliseconds
+    'cache_size': -64000,  # negative sizes are in KiB
+}
+SQLITE_OPTIONS = {
+    'init_command': '; '.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    'transaction_mode': 'IMMEDIATE',
+} if os.environ.get('SQLITE_TUNING', '1') == '1' else {}
+
+# The pragmas make opening a connection cost more than most queries, so keep it
+# between requests (see `manage.py benchmark_connections`). ASGI requests run
+# their queries on per-request threads, whose connections cannot be reused.
+DATABASE_CONN_MAX_AGE = 0 if SERVER_MODE == 'asgi' else 600
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'OPTIONS': SQLITE_OPTIONS,
+    },
+    # Local stand-in for a read replica: copy db.sqlite3 here to "replicate"
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'OPTIONS': SQLITE_OPTIONS,
+    },
 }
 
+# Aliases the profile and match reads go to (see api/routers.py); none reads everything from default
+DATABASE_REPLICAS = ['replica'] if os.environ.get('USE_SQLITE_REPLICA') else []
+
+# With DATABASE_POOL=1 each process keeps a psycopg pool per Postgres alias
+# instead of one persistent connection per thread, which also lets ASGI's
+# per-request threads reuse connections. Every process may open max_size
+# connections, so workers * max_size must stay under the server's max_connections.
+DATABASE_POOL = os.environ.get('DATABASE_POOL') == '1'
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+    'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),  # seconds a request waits for a connection
+    'max_idle': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300)),  # seconds before idle extras are closed
+    'max_lifetime': float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', 1800)),
+}
+
+
+def postgres_database(url):
+    if DATABASE_POOL:
+        from psycopg_pool import ConnectionPool
+
+        database = dj_database_url.parse(url, ssl_require=True)
+        # Checked out connections are tested first, so a dropped one is replaced rather than failing a request
+        database.setdefault('OPTIONS', {})['pool'] = {**DATABASE_POOL_OPTIONS, 'check': ConnectionPool.check_connection}
+        return database
+    return dj_database_url.parse(
+        url,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+        ssl_require=True,
+    )
+
+
 if 'DATABASE_URL' in os.environ:
-    DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
+    DATABASES['default'] = postgres_database(os.environ['DATABASE_URL'])
+    # Space-separated URLs of the primary's streaming replicas
+    DATABASE_REPLICAS = []
+    for number, url in enumerate(os.environ.get('DATABASE_REPLICA_URLS', '').split(), 1):
+        alias = 'replica' if number == 1 else f'replica{number}'
+        DATABASES[alias] = postgres_database(url)
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+# How long a user's reads stay on the primary after they like, block or report,
+# so replication lag never hides their own writes
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shiputy',
+    }
+}
+
+# Worker processes serving requests; gunicorn reads the same variable, and
+# shiputy/gunicorn_asgi.py exports the count it starts
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Blocks, reports, token revocation and replica pinning take effect by
+# deleting or setting cache keys, so every worker must share the cache: with
+# per-process LocMemCaches the other workers would go on serving stale
+# entries. Several workers therefore use the file cache even without CACHE_DIR.
+if 'CACHE_DIR' in os.environ or WEB_CONCURRENCY > 1:
+    # Shared between worker processes on the same host
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'shiputy-cache')),
+    }
 
 
 # Password validation
@@ -136,6 +250,24 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.media.HashedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Hand media bytes to the front proxy: None, 'nginx' (X-Accel-Redirect) or 'sendfile' (X-Sendfile)
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Resized profile picture variants are rendered by background threads
+PROFILE_PICTURE_ASYNC = True
+PROFILE_PICTURE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -147,7 +279,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 #TESTING
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -156,10 +288,36 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.rendering.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
-}
\ No newline at end of file
+}
+
+# How long CachedJWTAuthentication trusts a cached user context, in seconds
+AUTH_CONTEXT_TIMEOUT = 60
+
+# Write-behind last_active tracking (see api/activity.py)
+ACTIVITY_THROTTLE = timedelta(minutes=5)
+ACTIVITY_FLUSH_INTERVAL = timedelta(seconds=30)
+ACTIVITY_BATCH_SIZE = 500
+
+# Real-time like and match events (see api/events.py). The local broker only
+# reaches clients connected to the publishing process, so with WEB_CONCURRENCY
+# above 1 (shiputy/gunicorn_asgi.py starts one worker per core) set
+# EVENTS_BROKER to the dotted path of a broker class shared between workers.
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'api.events.LocalBroker')
+EVENTS_KEEPALIVE = 15  # seconds between keepalive comments on idle streams
+
+# Request instrumentation (see api/middleware.py)
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+INSTRUMENTATION_SLOW_QUERY_MS = 100
+INSTRUMENTATION_N_PLUS_ONE = 5  # identical query shapes per request that get logged as an N+1